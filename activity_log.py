@@ -0,0 +1,227 @@
+# Thatoyaone: Authentication & Security - Activity Log Pipeline
+
+import atexit
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlite_pool import ConnectionPool
+
+# Audit log settings (MINERALS_ACTIVITY_LOG sets the SQLite file)
+ACTIVITY_LOG_CONFIG = {
+    'path': os.environ.get('MINERALS_ACTIVITY_LOG', 'activity.db'),
+    'batch_size': 500,
+    'flush_interval': 0.5,
+    'max_pending': 100000,
+    'page_size': 50,
+    'max_page_size': 1000
+}
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def parse_time(value):
+    """Parse a time filter given as epoch seconds or an ISO date/datetime"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid time '{value}': use epoch seconds or YYYY-MM-DD[ HH:MM:SS]")
+
+
+class ActivityLog:
+    """Append-only activity log; requests only enqueue, a background thread batches entries into SQLite"""
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS activity (
+            id INTEGER PRIMARY KEY,
+            time REAL NOT NULL,
+            username TEXT NOT NULL,
+            role TEXT NOT NULL,
+            endpoint TEXT,
+            activity TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_activity_time ON activity (time);
+        CREATE INDEX IF NOT EXISTS idx_activity_username ON activity (username, time);
+        CREATE INDEX IF NOT EXISTS idx_activity_role ON activity (role, time);
+        CREATE INDEX IF NOT EXISTS idx_activity_endpoint ON activity (endpoint, time);
+    '''
+    COLUMNS = ('id', 'time', 'username', 'role', 'endpoint', 'activity')
+    # SQLite assigns the ids, so several processes can share one log file
+    INSERT_SQL = 'INSERT INTO activity (time, username, role, endpoint, activity) VALUES (?, ?, ?, ?, ?)'
+
+    def __init__(self, path, batch_size=500, flush_interval=0.5, max_pending=100000, pool_size=4):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # deque appends and pops are atomic, so recording never takes a lock
+        self._pending = deque()
+        # Nothing is opened until the first write or read, so importing the module touches no file
+        self._pool = ConnectionPool(path, pool_size, timeout=10)
+        self._write_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._writer = None
+        self._schema_ready = False
+        # Entries recorded by this process; the latest number changes whenever the log does
+        self._sequence = itertools.count(1)
+        self.last_sequence = 0
+        # Entries refused while the writer was too far behind, and how many of those the log already notes
+        self.dropped = 0
+        self._dropped_noted = 0
+
+    # WRITING
+
+    def record(self, username, role, endpoint, activity):
+        """Queue one entry; never blocks on I/O"""
+        if self._writer is None:
+            self._start()
+        self.last_sequence = next(self._sequence)
+        if len(self._pending) >= self.max_pending:
+            # Counted, and noted in the log itself once the writer catches up
+            self.dropped += 1
+            return
+        self._pending.append((time.time(), username, role or 'unknown', endpoint, activity))
+
+    def _start(self):
+        with self._start_lock:
+            if self._writer is not None:
+                return
+            self._writer = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+            self._writer.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write every pending entry, in batches; returns how many were written"""
+        written = 0
+        with self._write_lock, self.connection() as connection:
+            while self._pending:
+                batch = []
+                while self._pending and len(batch) < self.batch_size:
+                    batch.append(self._pending.popleft())
+                with connection:
+                    connection.executemany(self.INSERT_SQL, batch)
+                written += len(batch)
+            dropped = self.dropped
+            if dropped > self._dropped_noted:
+                with connection:
+                    connection.execute(self.INSERT_SQL, (
+                        time.time(), 'system', 'system', None,
+                        f"Activity log queue full: {dropped - self._dropped_noted} entries dropped"
+                    ))
+                self._dropped_noted = dropped
+        return written
+
+    def close(self):
+        """Stop the writer and write out whatever is still queued"""
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join()
+        self.flush()
+        self._pool.close()
+
+    # READING
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection, setting up the database on first use"""
+        with self._pool.connection() as connection:
+            if not self._schema_ready:
+                with self._start_lock:
+                    if not self._schema_ready:
+                        # Persisted in the database file, so every later connection is in WAL mode too
+                        connection.execute('PRAGMA journal_mode=WAL')
+                        with connection:
+                            connection.executescript(self.SCHEMA)
+                        self._schema_ready = True
+            yield connection
+
+    def version(self):
+        """Changes whenever an entry is recorded here or written by any process sharing the file"""
+        with self.connection() as connection:
+            return self.last_sequence, connection.execute('SELECT MAX(id) FROM activity').fetchone()[0]
+
+    @staticmethod
+    def _matches(entry, filters, since, until):
+        _, at, username, role, endpoint, _ = entry
+        values = {'username': username, 'role': role, 'endpoint': endpoint}
+        if any(values[field] != value for field, value in filters.items()):
+            return False
+        return (since is None or at >= since) and (until is None or at <= until)
+
+    def query(self, username=None, role=None, endpoint=None, since=None, until=None, limit=50):
+        """Newest entries matching every given filter, including ones not yet written"""
+        filters = {
+            field: value for field, value in
+            (('username', username), ('role', role), ('endpoint', endpoint)) if value is not None
+        }
+        clauses = [f'{field} = ?' for field in filters]
+        params = list(filters.values())
+        if since is not None:
+            clauses.append('time >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('time <= ?')
+            params.append(until)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        # Holding the writer's lock means every entry is either still queued or already in the
+        # table; only this read waits, never the requests that record entries
+        with self._write_lock, self.connection() as connection:
+            unwritten = [(None,) + entry for entry in self._pending]
+            rows = connection.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM activity{where} ORDER BY time DESC, id DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        # Queued entries have no id until they are written
+        queued = [entry for entry in unwritten if self._matches(entry, filters, since, until)]
+        newest = sorted(queued + rows, key=lambda entry: entry[1], reverse=True)[:limit]
+        return [self._describe(entry) for entry in newest]
+
+    @staticmethod
+    def _describe(entry):
+        entry_id, at, username, role, endpoint, activity = entry
+        return {
+            'id': entry_id,
+            'timestamp': datetime.fromtimestamp(at).strftime(TIMESTAMP_FORMAT),
+            'activity': activity,
+            'username': username,
+            'role': role,
+            'endpoint': endpoint
+        }
+
+
+activity_log = ActivityLog(
+    ACTIVITY_LOG_CONFIG['path'],
+    ACTIVITY_LOG_CONFIG['batch_size'],
+    ACTIVITY_LOG_CONFIG['flush_interval'],
+    ACTIVITY_LOG_CONFIG['max_pending']
+)
+atexit.register(activity_log.close)
+
+
+def activity_filters(args):
+    """Activity query filters from request args (user, role, endpoint, since, until, limit)"""
+    filters = {
+        'username': args.get('user') or None,
+        'role': args.get('role') or None,
+        'endpoint': args.get('endpoint') or None,
+        'since': parse_time(args['since']) if args.get('since') else None,
+        'until': parse_time(args['until']) if args.get('until') else None
+    }
+    try:
+        limit = int(args.get('limit', ACTIVITY_LOG_CONFIG['page_size']))
+    except ValueError:
+        raise ValueError(f"Invalid limit '{args.get('limit')}'")
+    filters['limit'] = max(1, min(limit, ACTIVITY_LOG_CONFIG['max_page_size']))
+    return filters
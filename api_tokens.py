@@ -0,0 +1,92 @@
+# Thatoyaone: Authentication & Security - API Bearer Tokens
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# Set MINERALS_TOKEN_SECRET to share tokens between processes and restarts;
+# without it every process signs with its own random key
+TOKEN_CONFIG = {
+    'secret': os.environ.get('MINERALS_TOKEN_SECRET'),
+    'ttl_seconds': 3600,
+    'cache_size': 1024
+}
+
+# Who a request acts as, whether it came with a session or a token
+AuthenticatedUser = namedtuple('AuthenticatedUser', ['username', 'role', 'permissions'])
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+class TokenManager:
+    """Stateless HMAC-SHA256 signed bearer tokens with an LRU of recently verified ones"""
+
+    def __init__(self, secret, ttl_seconds=3600, cache_size=1024):
+        self.secret = secret if isinstance(secret, bytes) else secret.encode('utf-8')
+        self.ttl_seconds = ttl_seconds
+        self.cache_size = cache_size
+        self._verified = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _sign(self, payload):
+        return _b64encode(hmac.new(self.secret, payload.encode('ascii'), hashlib.sha256).digest())
+
+    def issue(self, username, role, now=None):
+        """Signed token for a user, and the epoch second it expires"""
+        expires = int(now if now is not None else time.time()) + self.ttl_seconds
+        payload = _b64encode(json.dumps([username, role, expires], separators=(',', ':')).encode('utf-8'))
+        return f'{payload}.{self._sign(payload)}', expires
+
+    def verify(self, token, now=None):
+        """(username, role, expires) for a valid, unexpired token, otherwise None"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            claims = self._verified.get(token)
+            if claims is not None:
+                if claims[2] >= now:
+                    self._verified.move_to_end(token)
+                    return claims
+                del self._verified[token]
+                return None
+        # Only tokens that check out are cached, so forged ones cannot flush the cache
+        payload, _, signature = token.partition('.')
+        if not signature or not token.isascii() or not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+        try:
+            username, role, expires = json.loads(_b64decode(payload))
+        except (ValueError, TypeError):
+            return None
+        if expires < now:
+            return None
+        claims = (username, role, expires)
+        with self._lock:
+            self._verified[token] = claims
+            while len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return claims
+
+
+api_tokens = TokenManager(
+    TOKEN_CONFIG['secret'] or os.urandom(32),
+    TOKEN_CONFIG['ttl_seconds'],
+    TOKEN_CONFIG['cache_size']
+)
+
+
+def bearer_token(authorization):
+    """The token from an 'Authorization: Bearer <token>' header value, or None"""
+    scheme, _, token = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+    return token.strip()
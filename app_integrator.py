@@ -1,28 +1,79 @@
 # Napo Joy  Serobele: Application Integration & Project Management
 
-from flask import Flask, render_template_string, request, redirect, url_for, session, jsonify, send_from_directory
+from flask import Flask, request, redirect, url_for, session, jsonify, send_from_directory
+from flask.json.provider import DefaultJSONProvider
+from collections.abc import Sequence
 import os
 from datetime import datetime
 import random
 
 # Import modules from other team members
 from auth_manager import (
-    login_required, role_required, authenticate_user, 
-    update_user_login, track_activity, get_user_data, 
-    get_all_users, logout_user, LOGIN_HTML
+    login_required, role_required, permission_required, authenticate_user, 
+    update_user_login, track_activity, get_user_data, current_user, issue_api_token, 
+    get_all_users, logout_user, SESSION_CONFIG
 )
 from data_manager import (
-    data_manager, load_mineral_data, get_all_countries, get_all_mining_sites,
-    get_market_intelligence, get_investment_opportunities, get_platform_stats
-)
-from visualization_manager import (
-    get_index_template, get_dashboard_template, get_admin_template
+    data_manager, configure_storage, STORAGE_CONFIG, load_mineral_data, get_all_countries, get_all_mining_sites,
+    get_market_intelligence, get_investment_opportunities, get_platform_stats,
+    get_mineral_by_id, get_country_by_id, get_mining_site_by_id, search_minerals, search_all,
+    get_nearest_mining_sites, aggregate_mining_sites,
+    get_production_stats_trend, get_production_stats_rollup, get_joined_sites, query_collection,
+    get_collection_version, get_map_features, get_site_clusters, get_site_tile
 )
+from visualization_manager import template_manager, render_page, render_dashboard_fragments
+from csv_loader import load_data_directory
+from query_engine import MAX_LIMIT, QueryError, query_params, truthy
+from map_features import parse_layers
+from spatial_index import parse_bbox, snap_bbox
+from response_cache import ResponseCache
+from session_store import configure_sessions, start_session_sweeper, SESSION_STORE_CONFIG
+from activity_log import activity_log, activity_filters, ACTIVITY_LOG_CONFIG
+from permissions import load_roles
+from api_tokens import TOKEN_CONFIG
+from http_cache import conditional_get
+from records import Record
+from join_engine import JoinedSite
+
+class DataJSONProvider(DefaultJSONProvider):
+    """JSON provider that also serializes slotted records, joined views and snapshot-backed sequences"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (Record, JoinedSite)):
+            return o.to_dict()
+        if isinstance(o, Sequence):
+            return list(o)
+        return DefaultJSONProvider.default(o)
+
 
 # Initialize Flask application
 app = Flask(__name__)
+app.json = DataJSONProvider(app)
 app.secret_key = os.urandom(24)  # Secure secret key for session management
 
+# Keep session data on the server (MINERALS_SESSION_BACKEND=memory|sqlite); the cookie holds only an id
+session_store = configure_sessions(app, SESSION_CONFIG['timeout_minutes'] * 60)
+start_session_sweeper(session_store, SESSION_CONFIG['sweep_interval_seconds'])
+
+# Load the CSV exports in code/data into the data store
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code', 'data')
+csv_load_reports = load_data_directory(DATA_DIRECTORY, data_manager)
+
+# Compile the built-in roles and roles.csv into permission bitmasks
+load_roles(data_manager.get_table('roles'))
+
+# Select the storage backend (MINERALS_STORAGE_BACKEND=memory|sqlite-mirror)
+configure_storage()
+
+# Parse and compile the page templates once instead of on every request
+template_manager.compile_all(app.jinja_env)
+
+# Encoded collection responses, reused until the collection's data version changes
+response_cache = ResponseCache(app.json.dumps)
+# Encoded map tiles, least recently used evicted first
+tile_cache = ResponseCache(app.json.dumps, max_entries=4096, max_bytes=32 * 1024 * 1024)
+
 
 # STATIC FILE HANDLING
 
@@ -33,13 +84,33 @@ def serve_static(filename):
     return send_from_directory('static', filename)
 
 
+# PER-USER RESPONSE VARIANTS
+
+
+def user_variant():
+    """Session or token state that changes what a page or API response shows to the current user"""
+    user = current_user()
+    username = user.username if user else None
+    return (username, user.role if user else None, session.get('login_time'), get_user_data(username))
+
+def activity_variant():
+    """The newest entry in the shared activity log, shown by the admin views"""
+    return activity_log.version()
+
+def admin_variant():
+    """Admin pages also list every user's role and last login, and the activity log"""
+    users = tuple((name, user['role'], user['last_login']) for name, user in get_all_users().items())
+    return user_variant() + (users, activity_variant())
+
+
 # CORE APPLICATION ROUTES
 
 
 @app.route('/')
+@conditional_get()
 def index():
     """Display the main landing page with project information"""
-    return render_template_string(get_index_template())
+    return render_page('index')
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -50,12 +121,12 @@ def login():
         
         user = authenticate_user(username, password)
         if user:
-            # Successful login
+            # Successful login, under a new session id
+            session.regenerate()
             session['username'] = username
             session['role'] = user['role']
-            session['login_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             
-            # Update last login time
+            # Update last login time (also starts the session's expiry clock)
             update_user_login(username)
             
             # Track login activity
@@ -63,9 +134,9 @@ def login():
             
             return redirect(url_for('dashboard'))
         else:
-            return render_template_string(LOGIN_HTML, error="Invalid credentials")
+            return render_page('login', error="Invalid credentials")
     
-    return render_template_string(LOGIN_HTML)
+    return render_page('login')
 
 @app.route('/logout')
 def logout():
@@ -75,31 +146,39 @@ def logout():
 
 @app.route('/dashboard')
 @login_required
+@conditional_get('minerals', 'countries', 'mining_sites', 'investment_opportunities', vary=user_variant)
 def dashboard():
     """Display the main application dashboard with all features"""
-    user_data = get_user_data(session['username'])
+    user_data = get_user_data(current_user().username)
     track_activity("Accessed dashboard")
     
-    return render_template_string(
-        get_dashboard_template(), 
+    data = dict(
         minerals=load_mineral_data(),
         countries=get_all_countries(),
         mining_sites=get_all_mining_sites(),
         market_intelligence=get_market_intelligence(),
-        investment_opportunities=get_investment_opportunities(),
-        user_data=user_data
+        investment_opportunities=get_investment_opportunities()
     )
+    fragments = render_dashboard_fragments(user_data['role'], get_collection_version, **data)
+    return render_page('dashboard', fragments=fragments, user_data=user_data, **data)
 
 @app.route('/admin')
 @login_required
 @role_required('admin')
+@conditional_get('minerals', 'countries', 'mining_sites', vary=admin_variant)
 def admin_panel():
     """Display administrative control panel (admin only)"""
-    user_data = get_user_data(session['username'])
+    user_data = get_user_data(current_user().username)
     track_activity("Accessed admin panel")
+    try:
+        filters = activity_filters(request.args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     
-    return render_template_string(
-        get_admin_template(),
+    return render_page(
+        'admin',
+        activities=activity_log.query(**filters),
+        activity_filters=request.args,
         users=get_all_users(),
         minerals=load_mineral_data(),
         countries=get_all_countries(),
@@ -110,45 +189,224 @@ def admin_panel():
 
 # RESTful API ENDPOINTS
 
+def collection_response(collection, load_all):
+    """Serve a collection, applying ?field=, ?field_gte=, sort, fields, limit and cursor when given"""
+    try:
+        body = response_cache.render(
+            (collection, tuple(sorted(query_params(request.args)))),
+            get_collection_version(collection),
+            lambda: build_collection_payload(collection, load_all),
+            datetime.now().isoformat()
+        )
+    except QueryError as error:
+        return jsonify({"status": "error", "message": str(error)}), 400
+    return app.response_class(body, mimetype='application/json')
+
+def build_collection_payload(collection, load_all):
+    """Collection response payload without its timestamp"""
+    if not query_params(request.args):
+        records = load_all()
+        return {"status": "success", "data": records, "count": len(records)}
+    result = query_collection(collection, request.args)
+    if 'data' not in result:
+        # count_only
+        return {"status": "success", "count": result['total']}
+    payload = {
+        "status": "success",
+        "data": result['data'],
+        "count": len(result['data']),
+        "total": result['total'],
+        "next_cursor": result['next_cursor']
+    }
+    if truthy(request.args.get('explain', '')):
+        payload["plan"] = result['plan']
+    return payload
 
 @app.route('/api/minerals')
 @login_required
+@conditional_get('minerals')
 def api_minerals():
     """API endpoint: Returns JSON data for all critical minerals"""
     track_activity("Accessed minerals API")
-    return jsonify({
-        "status": "success",
-        "data": load_mineral_data(),
-        "count": len(load_mineral_data()),
-        "timestamp": datetime.now().isoformat()
-    })
+    return collection_response('minerals', load_mineral_data)
 
 @app.route('/api/countries')
 @login_required
+@conditional_get('countries')
 def api_countries():
     """API endpoint: Returns JSON data for all African countries"""
     track_activity("Accessed countries API")
+    return collection_response('countries', get_all_countries)
+
+@app.route('/api/mining-sites')
+@login_required
+@conditional_get('mining_sites')
+def api_mining_sites():
+    """API endpoint: Returns JSON data for mining sites, optionally inside ?bbox=west,south,east,north"""
+    track_activity("Accessed mining sites API")
+    return collection_response('mining_sites', get_all_mining_sites)
+
+@app.route('/api/mining-sites/nearest')
+@login_required
+@conditional_get('mining_sites')
+def api_nearest_mining_sites():
+    """API endpoint: Returns the k mining sites nearest to ?lat=&lng="""
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    k = request.args.get('k', default=5, type=int)
+    if lat is None or lng is None or not -90 <= lat <= 90 or not 0 < k <= 1000:
+        return jsonify({"status": "error", "message": "Provide lat, lng and 0 < k <= 1000"}), 400
+    sites = get_nearest_mining_sites(lat, lng, k)
+    track_activity(f"Searched mining sites near {lat}, {lng}")
     return jsonify({
         "status": "success",
-        "data": get_all_countries(),
-        "count": len(get_all_countries()),
+        "data": sites,
+        "count": len(sites),
         "timestamp": datetime.now().isoformat()
     })
 
-@app.route('/api/mining-sites')
+@app.route('/api/mining-sites/aggregate')
 @login_required
-def api_mining_sites():
-    """API endpoint: Returns JSON data for all mining sites"""
-    track_activity("Accessed mining sites API")
+@conditional_get('mining_sites')
+def api_aggregate_mining_sites():
+    """API endpoint: Aggregates mining sites, e.g. ?by=mineral&column=production&agg=sum&status=Active"""
+    # Leftover args are filters; _-prefixed ones (cache-busters) are ignored as in collection queries
+    args = dict(query_params(request.args))
+    by = args.pop('by', 'mineral')
+    column = args.pop('column', None)
+    agg = args.pop('agg', 'sum' if column else 'count')
+    try:
+        groups = aggregate_mining_sites(by, column, agg, args)
+    except ValueError as error:
+        return jsonify({"status": "error", "message": str(error)}), 400
+    track_activity(f"Aggregated mining sites by {by}")
+    return jsonify({
+        "status": "success",
+        "by": by,
+        "column": column,
+        "agg": agg,
+        "data": groups,
+        "timestamp": datetime.now().isoformat()
+    })
+
+@app.route('/api/production-stats')
+@login_required
+@permission_required('export_data')
+@conditional_get('production_stats')
+def api_production_stats():
+    """API endpoint: Yearly production series with growth and moving averages"""
+    country = request.args.get('country')
+    mineral = request.args.get('mineral')
+    window = request.args.get('window', default=3, type=int)
+    if window < 1:
+        return jsonify({"status": "error", "message": "window must be at least 1"}), 400
+    track_activity("Accessed production statistics API")
+    series = get_production_stats_trend(country, mineral, window)
+    return jsonify({
+        "status": "success",
+        "country": country,
+        "mineral": mineral,
+        "data": series,
+        "count": len(series),
+        "timestamp": datetime.now().isoformat()
+    })
+
+@app.route('/api/production-stats/rollup/<dimension>')
+@login_required
+@permission_required('export_data')
+@conditional_get('production_stats')
+def api_production_stats_rollup(dimension):
+    """API endpoint: Production totals per country, mineral or year"""
+    year = request.args.get('year', type=int)
+    try:
+        rollup = get_production_stats_rollup(dimension, year)
+    except ValueError as error:
+        return jsonify({"status": "error", "message": str(error)}), 400
+    track_activity(f"Accessed production statistics by {dimension}")
+    return jsonify({
+        "status": "success",
+        "dimension": dimension,
+        "year": year,
+        "data": rollup,
+        "timestamp": datetime.now().isoformat()
+    })
+
+@app.route('/api/sites/joined')
+@login_required
+@conditional_get('sites', 'mining_sites', 'countries', 'minerals')
+def api_joined_sites():
+    """API endpoint: Sites with their country and mineral profiles, e.g. ?mineral=Cobalt"""
+    source = request.args.get('source', 'sites')
+    try:
+        views = get_joined_sites(source, request.args.get('mineral'), request.args.get('country'))
+    except ValueError as error:
+        return jsonify({"status": "error", "message": str(error)}), 400
+    track_activity("Accessed joined sites API")
+    return jsonify({
+        "status": "success",
+        "source": source,
+        "data": views,
+        "count": len(views),
+        "timestamp": datetime.now().isoformat()
+    })
+
+@app.route('/api/map/features.geojson')
+@login_required
+@conditional_get('countries', 'mining_sites')
+def api_map_features():
+    """API endpoint: Countries and mining sites as GeoJSON (?layers=, ?bbox=, ?summary=1)"""
+    try:
+        layers = parse_layers(request.args.get('layers'))
+        bbox = parse_bbox(request.args['bbox']) if request.args.get('bbox') else None
+    except ValueError as error:
+        return jsonify({"status": "error", "message": str(error)}), 400
+    # Nearby views share a widened box (and cache entry) instead of caching every pan position
+    bbox = snap_bbox(bbox) if bbox else None
+    summary = request.args.get('summary', '').lower() in ('1', 'true', 'yes')
+    body = response_cache.document(
+        ('map_features', layers, bbox, summary),
+        (get_collection_version('countries'), get_collection_version('mining_sites')),
+        lambda: get_map_features(layers, bbox, summary)
+    )
+    return app.response_class(body, mimetype='application/geo+json')
+
+@app.route('/api/map/clusters')
+@login_required
+@conditional_get('mining_sites')
+def api_map_clusters():
+    """API endpoint: Mining site clusters for a map view, e.g. ?zoom=5&bbox=west,south,east,north"""
+    zoom = request.args.get('zoom', type=int)
+    if zoom is None or zoom < 0:
+        return jsonify({"status": "error", "message": "Provide a zoom level >= 0"}), 400
+    try:
+        bbox = parse_bbox(request.args['bbox']) if request.args.get('bbox') else None
+    except ValueError as error:
+        return jsonify({"status": "error", "message": str(error)}), 400
+    zoom, clusters = get_site_clusters(zoom, bbox)
+    track_activity("Viewed site clusters")
     return jsonify({
         "status": "success",
-        "data": get_all_mining_sites(),
-        "count": len(get_all_mining_sites()),
+        "zoom": zoom,
+        "data": clusters,
+        "count": len(clusters),
         "timestamp": datetime.now().isoformat()
     })
 
+@app.route('/tiles/sites/<int:z>/<int:x>/<int:y>')
+@login_required
+@conditional_get('mining_sites')
+def site_tile(z, x, y):
+    """Map tile: GeoJSON mining sites (or clusters, for crowded tiles) inside slippy-map tile z/x/y"""
+    if z > 22 or x >= 2 ** z or y >= 2 ** z:
+        return jsonify({"status": "error", "message": "Tile out of range"}), 404
+    body = tile_cache.document(
+        (z, x, y), get_collection_version('mining_sites'), lambda: get_site_tile(z, x, y)
+    )
+    return app.response_class(body, mimetype='application/geo+json')
+
 @app.route('/api/market-intelligence')
 @login_required
+@conditional_get()
 def api_market_intelligence():
     """API endpoint: Returns real-time market data and news"""
     track_activity("Accessed market intelligence API")
@@ -160,25 +418,22 @@ def api_market_intelligence():
 
 @app.route('/api/investment-opportunities')
 @login_required
+@conditional_get('investment_opportunities', vary=user_variant)
 def api_investment_opportunities():
     """API endpoint: Returns investment projects (investor/admin only)"""
-    user_role = get_user_data(session['username']).get('role')
+    user_role = current_user().role
     if user_role not in ['investor', 'admin']:
         return jsonify({"status": "error", "message": "Access denied"}), 403
     
     track_activity("Accessed investment opportunities API")
-    return jsonify({
-        "status": "success",
-        "data": get_investment_opportunities(),
-        "count": len(get_investment_opportunities()),
-        "timestamp": datetime.now().isoformat()
-    })
+    return collection_response('investment_opportunities', get_investment_opportunities)
 
 @app.route('/api/mineral/<int:mineral_id>')
 @login_required
+@conditional_get('minerals')
 def api_mineral(mineral_id):
     """API endpoint: Returns detailed data for a specific mineral by ID"""
-    mineral = data_manager.get_mineral_by_id(mineral_id)
+    mineral = get_mineral_by_id(mineral_id)
     if mineral:
         track_activity(f"Accessed mineral data: {mineral['name']}")
         return jsonify({
@@ -190,9 +445,10 @@ def api_mineral(mineral_id):
 
 @app.route('/api/country/<int:country_id>')
 @login_required
+@conditional_get('countries')
 def api_country(country_id):
     """API endpoint: Returns detailed profile for a specific country by ID"""
-    country = data_manager.get_country_by_id(country_id)
+    country = get_country_by_id(country_id)
     if country:
         track_activity(f"Accessed country data: {country['name']}")
         return jsonify({
@@ -204,9 +460,10 @@ def api_country(country_id):
 
 @app.route('/api/mining-site/<int:site_id>')
 @login_required
+@conditional_get('mining_sites')
 def api_mining_site(site_id):
     """API endpoint: Returns detailed data for a specific mining site by ID"""
-    site = data_manager.get_mining_site_by_id(site_id)
+    site = get_mining_site_by_id(site_id)
     if site:
         track_activity(f"Accessed mining site data: {site['name']}")
         return jsonify({
@@ -218,9 +475,10 @@ def api_mining_site(site_id):
 
 @app.route('/api/search/minerals/<query>')
 @login_required
+@conditional_get('minerals')
 def api_search_minerals(query):
-    """API endpoint: Search minerals by name, description, or applications"""
-    results = data_manager.search_minerals(query)
+    """API endpoint: Search minerals whose name or description contains the query"""
+    results = search_minerals(query)
     track_activity(f"Searched minerals for: {query}")
     return jsonify({
         "status": "success",
@@ -230,8 +488,39 @@ def api_search_minerals(query):
         "timestamp": datetime.now().isoformat()
     })
 
+@app.route('/api/search')
+@login_required
+@conditional_get('minerals', 'countries', 'mining_sites')
+def api_search():
+    """API endpoint: Ranked search across minerals, countries and mining sites"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"status": "error", "message": "Missing query parameter 'q'"}), 400
+    types = request.args.get('type')
+    collections = tuple(types.split(',')) if types else None
+    if collections and not set(collections) <= {'minerals', 'countries', 'mining_sites'}:
+        return jsonify({"status": "error", "message": "Unknown search type"}), 400
+    limit = None
+    if request.args.get('limit'):
+        try:
+            limit = int(request.args['limit'])
+        except ValueError:
+            return jsonify({"status": "error", "message": "limit must be an integer"}), 400
+        if not 0 < limit <= MAX_LIMIT:
+            return jsonify({"status": "error", "message": f"limit must be between 1 and {MAX_LIMIT}"}), 400
+    results = search_all(query, collections, limit)
+    track_activity(f"Searched for: {query}")
+    return jsonify({
+        "status": "success",
+        "query": query,
+        "results": results,
+        "count": len(results),
+        "timestamp": datetime.now().isoformat()
+    })
+
 @app.route('/api/stats')
 @login_required
+@conditional_get('minerals', 'countries', 'mining_sites', 'investment_opportunities')
 def api_stats():
     """API endpoint: Returns comprehensive platform statistics"""
     track_activity("Accessed platform statistics")
@@ -244,12 +533,44 @@ def api_stats():
 @app.route('/api/user-activity')
 @login_required
 @role_required('admin')
+@conditional_get(vary=admin_variant)
 def api_user_activity():
-    """API endpoint: Returns activity tracking data (admin only)"""
+    """API endpoint: Returns activity log entries, filtered by ?user=, role, endpoint, since, until and limit (admin only)"""
     track_activity("Accessed user activity API")
+    try:
+        activities = activity_log.query(**activity_filters(request.args))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({
+        "status": "success",
+        "data": activities,
+        "count": len(activities),
+        "timestamp": datetime.now().isoformat()
+    })
+
+@app.route('/api/token', methods=['POST'])
+def api_token():
+    """API endpoint: Exchange credentials for a signed bearer token (Authorization: Bearer <token>)"""
+    credentials = request.get_json(silent=True) if request.is_json else request.form
+    if not isinstance(credentials, dict) and not hasattr(credentials, 'getlist'):
+        return jsonify({"status": "error", "message": "Send username and password as a JSON object or form fields"}), 400
+    username = credentials.get('username')
+    password = credentials.get('password')
+    if not isinstance(username, str) or not isinstance(password, str):
+        return jsonify({"status": "error", "message": "username and password are required"}), 400
+    
+    issued = issue_api_token(username, password)
+    if issued is None:
+        return jsonify({"status": "error", "message": "Invalid credentials"}), 401
+    token, expires = issued
     return jsonify({
         "status": "success",
-        "data": session.get('user_activity', []),
+        "data": {
+            "token": token,
+            "token_type": "Bearer",
+            "expires_at": expires,
+            "expires_in": TOKEN_CONFIG['ttl_seconds']
+        },
         "timestamp": datetime.now().isoformat()
     })
 
@@ -310,6 +631,12 @@ class ApplicationManager:
         print(f"   • {len(get_all_users())} user accounts")
         print(f"   • {len(get_market_intelligence()['market_news'])} market news items")
         print(f"   • {len(get_investment_opportunities())} investment opportunities")
+        print(f"   • Storage backend: {STORAGE_CONFIG['backend']}")
+        print(f"   • Session backend: {SESSION_STORE_CONFIG['backend']}")
+        print(f"   • Activity log: {ACTIVITY_LOG_CONFIG['path']}")
+        print("\n📥 CSV data loaded:")
+        for report in csv_load_reports:
+            print(f"   • {report}")
         print("\n🔑 Demo Login Credentials:")
         for username, user in get_all_users().items():
             print(f"   • {username} ({user['role']}) - Password: {user['password']}")
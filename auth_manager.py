@@ -1,9 +1,14 @@
 # Thatoyaone: Authentication & Security System
 
 
-from flask import session, redirect, url_for
+import time
+
+from flask import session, redirect, url_for, request, g, jsonify
 from functools import wraps
-from datetime import datetime
+
+from activity_log import activity_log
+from permissions import BUILTIN_ROLES, PERMISSION_BITS, permission_mask, permission_names, role_mask
+from api_tokens import AuthenticatedUser, api_tokens, bearer_token
 
 # User database with enhanced security features
 USERS = {
@@ -36,41 +41,125 @@ USERS = {
 # Session configuration
 SESSION_CONFIG = {
     'timeout_minutes': 60,
-    'max_activities': 20,
+    # Expire after timeout_minutes idle (sliding) rather than timeout_minutes after login
+    'sliding_expiry': True,
+    # last_seen is only rewritten once it is this stale, so most requests leave the session unmodified
+    'last_seen_granularity_seconds': 60,
+    'sweep_interval_seconds': 300,
     'secure_cookies': True
 }
 
 def login_required(f):
-    """Decorator to ensure user is logged in before accessing protected routes"""
+    """Decorator to ensure user is logged in (by session or bearer token) before accessing protected routes"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
+        if has_bearer_token():
+            # Token clients never touch the session
+            if token_user() is None:
+                return login_denied()
+            return f(*args, **kwargs)
         if 'username' not in session:
             return redirect(url_for('login'))
         
         # Check session timeout
-        if is_session_expired():
+        now = int(time.time())
+        if is_session_expired(now):
             logout_user()
             return redirect(url_for('login'))
+        refresh_last_seen(now)
             
         return f(*args, **kwargs)
     return decorated_function
 
 def role_required(role):
-    """Decorator for role-based access control with enhanced security"""
+    """Decorator allowing only users holding every permission of a built-in role (admin holds them all)"""
+    if role not in BUILTIN_ROLES:
+        raise ValueError(f"Unknown role: {role}")
+    required = permission_mask(BUILTIN_ROLES[role])
+
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            if 'username' not in session:
-                return redirect(url_for('login'))
+            user = current_user()
+            if user is None:
+                return login_denied()
             
-            user_role = USERS.get(session['username'], {}).get('role')
-            if user_role != role and user_role != 'admin':
-                track_activity(f"Access denied for {session['username']} to {role}-restricted resource")
+            if user.permissions & required != required:
+                track_activity(f"Access denied for {user.username} to {role}-restricted resource")
                 return "Access denied: Insufficient permissions", 403
             return f(*args, **kwargs)
         return decorated_function
     return decorator
 
+def permission_required(permission):
+    """Decorator allowing only users whose role grants the permission (a single bit test)"""
+    if permission not in PERMISSION_BITS:
+        raise ValueError(f"Unknown permission: {permission}")
+    bit = PERMISSION_BITS[permission]
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            user = current_user()
+            if user is None:
+                return login_denied()
+            
+            if not user.permissions & bit:
+                track_activity(f"Access denied for {user.username} to {permission}-restricted resource")
+                return "Access denied: Insufficient permissions", 403
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+def session_permissions():
+    """The session user's permission bitmask, looked up from their current role on every request"""
+    return role_mask(session.get('role'))
+
+def has_bearer_token():
+    """Whether the request authenticates with 'Authorization: Bearer' (other schemes fall back to the session)"""
+    return bearer_token(request.headers.get('Authorization')) is not None
+
+def token_user():
+    """The user named by the request's bearer token (verified once per request), or None"""
+    if 'token_user' not in g:
+        user = None
+        token = bearer_token(request.headers.get('Authorization'))
+        claims = api_tokens.verify(token) if token else None
+        if claims is not None:
+            username, role, _ = claims
+            user = AuthenticatedUser(username, role, role_mask(role))
+        g.token_user = user
+    return g.token_user
+
+def current_user():
+    """The user making the request, from the bearer token if one was sent, otherwise the session"""
+    if has_bearer_token():
+        return token_user()
+    if 'username' not in session:
+        return None
+    return AuthenticatedUser(session['username'], session.get('role'), session_permissions())
+
+def login_denied():
+    """Token clients get a 401; browsers are sent to the login page"""
+    if has_bearer_token():
+        response = jsonify({"status": "error", "message": "Invalid or expired token"})
+        response.headers['WWW-Authenticate'] = 'Bearer'
+        return response, 401
+    return redirect(url_for('login'))
+
+def issue_api_token(username, password):
+    """Signed bearer token and its expiry (epoch seconds) for valid credentials, otherwise None; both outcomes are logged"""
+    user = authenticate_user(username, password)
+    if not user:
+        track_activity(
+            f"Failed API token request for {username[:64]}",
+            AuthenticatedUser(username if username in USERS else 'unknown', 'anonymous', 0)
+        )
+        return None
+    role = user['role']
+    track_activity("Issued API token", AuthenticatedUser(username, role, role_mask(role)))
+    return api_tokens.issue(username, role)
+
 def authenticate_user(username, password):
     """Enhanced user authentication with validation"""
     user = USERS.get(username)
@@ -81,21 +170,17 @@ def authenticate_user(username, password):
 def update_user_login(username):
     """Update user's last login time and session data"""
     if username in USERS:
-        USERS[username]['last_login'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        session['login_time'] = USERS[username]['last_login']
+        # Epoch seconds; templates format them with the |epoch filter
+        now = int(time.time())
+        USERS[username]['last_login'] = now
+        session['login_time'] = now
+        session['last_seen'] = now
 
-def track_activity(activity_description):
-    """Enhanced activity tracking with session management"""
-    if 'username' in session:
-        user_activity = session.get('user_activity', [])
-        user_activity.append({
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'activity': activity_description,
-            'username': session['username'],
-            'role': session.get('role', 'unknown')
-        })
-        # Keep only the most recent activities
-        session['user_activity'] = user_activity[-SESSION_CONFIG['max_activities']:]
+def track_activity(activity_description, user=None):
+    """Queue an entry in the shared activity log; the request never waits on the write"""
+    user = user or current_user()
+    if user is not None:
+        activity_log.record(user.username, user.role, request.endpoint, activity_description)
 
 def get_user_data(username):
     """Get user data by username with privacy protection"""
@@ -120,24 +205,24 @@ def logout_user():
         track_activity(f"User {session['username']} logged out")
     session.clear()
 
-def is_session_expired():
-    """Check if user session has expired"""
-    login_time = session.get('login_time')
-    if not login_time:
+def is_session_expired(now=None):
+    """Check if user session has expired (an integer comparison against the epoch times in the session)"""
+    started = session.get('last_seen' if SESSION_CONFIG['sliding_expiry'] else 'login_time')
+    if not isinstance(started, int):
+        # Missing, or a session from before times were stored as epoch seconds
         return True
-    
-    login_dt = datetime.strptime(login_time, '%Y-%m-%d %H:%M:%S')
-    session_duration = datetime.now() - login_dt
-    return session_duration.total_seconds() > SESSION_CONFIG['timeout_minutes'] * 60
+    if now is None:
+        now = int(time.time())
+    return now - started > SESSION_CONFIG['timeout_minutes'] * 60
+
+def refresh_last_seen(now):
+    """Slide the session's expiry forward, writing the session at most once per granularity"""
+    if now - session.get('last_seen', 0) >= SESSION_CONFIG['last_seen_granularity_seconds']:
+        session['last_seen'] = now
 
 def get_user_permissions(role):
     """Get permissions for different user roles"""
-    permissions = {
-        'admin': ['read', 'write', 'delete', 'manage_users', 'view_reports'],
-        'investor': ['read', 'export_data', 'view_investments', 'view_market_data'],
-        'researcher': ['read', 'export_data', 'view_reports']
-    }
-    return permissions.get(role, ['read'])
+    return permission_names(role_mask(role))
 
 # HTML Template for login (kept here for authentication context)
 LOGIN_HTML = '''
@@ -0,0 +1,56 @@
+# Napo Joy  Serobele: Application Integration - Template Rendering Benchmark
+
+import timeit
+
+from flask import render_template_string, session
+
+from activity_log import activity_log
+from app_integrator import app
+from auth_manager import get_all_users, get_user_data
+from data_manager import (
+    load_mineral_data, get_all_countries, get_all_mining_sites,
+    get_market_intelligence, get_investment_opportunities, get_collection_version
+)
+from visualization_manager import template_manager, render_page, render_dashboard_fragments
+
+RUNS = 200
+
+
+def page_context(name):
+    """The context each route passes to its template"""
+    if name == 'dashboard':
+        data = dict(
+            minerals=load_mineral_data(), countries=get_all_countries(),
+            mining_sites=get_all_mining_sites(), market_intelligence=get_market_intelligence(),
+            investment_opportunities=get_investment_opportunities()
+        )
+        fragments = render_dashboard_fragments('admin', get_collection_version, **data)
+        return dict(data, fragments=fragments, user_data=get_user_data('admin01'))
+    if name == 'admin':
+        return dict(
+            users=get_all_users(), minerals=load_mineral_data(), countries=get_all_countries(),
+            mining_sites=get_all_mining_sites(), user_data=get_user_data('admin01'),
+            activities=activity_log.query(), activity_filters={}
+        )
+    return {}
+
+
+def benchmark(runs=RUNS):
+    """Per-render cost of re-parsing each template versus rendering the compiled one"""
+    results = {}
+    with app.test_request_context('/'):
+        session['username'] = 'admin01'
+        session['role'] = 'admin'
+        for name in ('index', 'login', 'dashboard', 'admin'):
+            source = template_manager.get_template(name)
+            context = page_context(name)
+            before = timeit.timeit(lambda: render_template_string(source, **context), number=runs) / runs
+            after = timeit.timeit(lambda: render_page(name, **context), number=runs) / runs
+            results[name] = (len(source), before * 1000, after * 1000)
+    return results
+
+
+if __name__ == '__main__':
+    print(f"{'template':<10} {'size':>8} {'re-parse ms':>12} {'compiled ms':>12} {'speedup':>8}")
+    for name, (size, before, after) in benchmark().items():
+        print(f"{name:<10} {size:>8} {before:>12.3f} {after:>12.3f} {before / after:>7.1f}x")
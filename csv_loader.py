@@ -0,0 +1,162 @@
+# MRMODEPEKHALEMO: Data Management - CSV Loading
+
+import csv
+import os
+import time
+
+
+class SchemaError(ValueError):
+    """Raised when a CSV header does not match its schema"""
+
+
+class Column:
+    """A typed column in a CSV schema"""
+
+    def __init__(self, name, kind=str, required=True):
+        self.name = name
+        self.kind = kind
+        self.required = required
+
+    def coerce(self, value):
+        """Convert a raw CSV cell to the column type"""
+        value = value.strip()
+        if value == '':
+            if self.required:
+                raise ValueError(f"missing value for '{self.name}'")
+            return None
+        if self.kind in (int, float):
+            value = value.replace(',', '')
+        return self.kind(value)
+
+
+class CsvSchema:
+    """Column definitions for one CSV file and the table it loads into"""
+
+    def __init__(self, table, columns):
+        self.table = table
+        self.columns = columns
+
+    def compile(self, header):
+        """Compile the schema against a file header into a row converter"""
+        positions = {name.strip(): index for index, name in enumerate(header)}
+        missing = [column.name for column in self.columns if column.name not in positions]
+        if missing:
+            raise SchemaError(f"{self.table}: missing columns {', '.join(missing)}")
+        plan = [(column.name, positions[column.name], column.coerce) for column in self.columns]
+        width = len(header)
+
+        def convert(row):
+            if len(row) != width:
+                raise ValueError(f"expected {width} fields, got {len(row)}")
+            return {name: coerce(row[index]) for name, index, coerce in plan}
+
+        return convert
+
+
+class LoadReport:
+    """Row counts and throughput for one loaded file"""
+
+    MAX_ERRORS = 10
+
+    def __init__(self, path, table):
+        self.path = path
+        self.table = table
+        self.rows = 0
+        self.rejected = 0
+        self.seconds = 0.0
+        self.errors = []
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def reject(self, line_number, error):
+        """Record a row that failed validation"""
+        self.rejected += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append(f"line {line_number}: {error}")
+
+    def __str__(self):
+        return (f"{os.path.basename(self.path)}: {self.rows} rows, {self.rejected} rejected, "
+                f"{self.rows_per_second:,.0f} rows/s")
+
+
+CSV_SCHEMAS = {
+    'countries.csv': CsvSchema('countries_csv', [
+        Column('id', int), Column('name'), Column('region'),
+        Column('gdp_billion_usd', float), Column('mining_contribution_percent', float),
+        Column('political_stability')
+    ]),
+    'minerals.csv': CsvSchema('minerals_csv', [
+        Column('id', int), Column('name'), Column('description'),
+        Column('critical_uses'), Column('global_reserves_years', int)
+    ]),
+    'mining_sites.csv': CsvSchema('mining_sites_csv', [
+        Column('id', int), Column('site_name'), Column('country'), Column('mineral'),
+        Column('latitude', float), Column('longitude', float), Column('status'),
+        Column('annual_production_tonnes', int)
+    ]),
+    'sites.csv': CsvSchema('sites', [
+        Column('SiteID', int), Column('SiteName'), Column('CountryID', int),
+        Column('MineralID', int), Column('Latitude', float), Column('Longitude', float),
+        Column('Production_tonnes', int)
+    ]),
+    'production_stats.csv': CsvSchema('production_stats', [
+        Column('id', int), Column('country'), Column('mineral'), Column('year', int),
+        Column('production_tonnes', int), Column('export_value_million_usd', float)
+    ]),
+    'users.csv': CsvSchema('users', [
+        Column('UserID', int), Column('Username'), Column('PasswordHash'),
+        Column('RoleID', int), Column('Email', required=False)
+    ]),
+    'roles.csv': CsvSchema('roles', [
+        Column('RoleID', int), Column('RoleName'), Column('Permissions', required=False)
+    ])
+}
+
+
+def iter_rows(path, schema, report=None):
+    """Stream validated rows from a CSV file, skipping rows that fail the schema"""
+    # utf-8-sig strips the byte order mark some exports start with
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        reader = csv.reader(handle)
+        header = next(reader, None)
+        if header is None:
+            return
+        convert = schema.compile(header)
+        for row in reader:
+            if not row:
+                continue
+            try:
+                yield convert(row)
+            except (TypeError, ValueError) as error:
+                if report is not None:
+                    report.reject(reader.line_num, error)
+
+
+def load_csv(path, schema, store, batch_size=5000):
+    """Load a CSV file into the store in batches, holding at most one batch in memory"""
+    report = LoadReport(path, schema.table)
+    started = time.perf_counter()
+    batch = []
+    for row in iter_rows(path, schema, report):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            store.bulk_insert(schema.table, batch)
+            report.rows += len(batch)
+            batch = []
+    if batch:
+        store.bulk_insert(schema.table, batch)
+        report.rows += len(batch)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def load_data_directory(directory, store, batch_size=5000):
+    """Load every known CSV file found in a directory into the store"""
+    reports = []
+    for filename, schema in CSV_SCHEMAS.items():
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            reports.append(load_csv(path, schema, store, batch_size))
+    return reports
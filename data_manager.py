@@ -1,5 +1,21 @@
 # MRMODEPEKHALEMO: Data Management
 
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+from records import as_record
+from join_engine import JoinEngine
+from map_features import feature_collection
+from production_stats import ProductionStatsEngine
+from query_engine import CollectionQuery, QueryPlanner
+from search_index import InvertedIndex, SEARCH_FIELDS
+from site_clusters import MAX_CLUSTER_ZOOM, SiteClusters
+from site_table import SiteTable
+from spatial_index import GridIndex, tile_bbox, tile_of
+
 MINERALS = [
     {
         "id": 1,
@@ -258,45 +274,555 @@ INVESTMENT_OPPORTUNITIES = [
     }
 ]
 
+# QUANTITY NORMALIZATION
+
+# Free-text quantity fields parsed into numeric companions at load time
+NUMERIC_FIELDS = {
+    'minerals': ('reserves', 'production', 'demand_growth'),
+    'countries': ('gdp', 'population', 'mining_contribution', 'mining_employment', 'area'),
+    'mining_sites': ('production', 'reserves', 'employment', 'estimated_lifespan'),
+    'investment_opportunities': ('investment_required', 'estimated_roi')
+}
+
+MULTIPLIERS = {
+    'thousand': 1e3, 'k': 1e3,
+    'million': 1e6, 'm': 1e6,
+    'billion': 1e9, 'b': 1e9,
+    'trillion': 1e12
+}
+
+QUANTITY_PATTERN = re.compile(
+    r'(?P<number>[-+]?\d[\d,]*(?:\.\d+)?)\s*(?P<multiplier>thousand|million|billion|trillion|[kmb](?![a-z]))?',
+    re.IGNORECASE
+)
+
+Quantity = namedtuple('Quantity', ['value', 'unit'])
+
+def parse_quantity(text):
+    """Parse a human-readable quantity such as '7.1 million tonnes' into a Quantity"""
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return Quantity(float(text), '')
+    match = QUANTITY_PATTERN.search(text)
+    if not match:
+        return None
+    value = float(match.group('number').replace(',', ''))
+    multiplier = match.group('multiplier')
+    if multiplier:
+        value *= MULTIPLIERS[multiplier.lower()]
+    unit = (text[:match.start()] + ' ' + text[match.end():]).replace('+', ' ')
+    return Quantity(value, ' '.join(unit.split()))
+
+def normalize_record(collection, record):
+    """Parse the numeric fields of a record into a {field: Quantity} view"""
+    numeric = {}
+    for field in NUMERIC_FIELDS.get(collection, ()):
+        quantity = parse_quantity(record.get(field))
+        if quantity is not None:
+            numeric[field] = quantity
+    return numeric
+
+
+class DataManager:
+    """Indexed access to minerals, countries, mining sites and investments"""
+
+    COLLECTIONS = ('minerals', 'countries', 'mining_sites', 'investment_opportunities')
+
+    def __init__(self, minerals, countries, mining_sites, investment_opportunities, snapshot=None):
+        records = (minerals, countries, mining_sites, investment_opportunities)
+        if snapshot is None:
+            records = [
+                [as_record(name, record) for record in collection]
+                for name, collection in zip(self.COLLECTIONS, records)
+            ]
+        self.collections = dict(zip(self.COLLECTIONS, records))
+        self.snapshot = snapshot
+        self.versions = {name: 0 for name in self.COLLECTIONS}
+        # Epoch seconds of the last change to each collection or table
+        self.modified = {name: time.time() for name in self.COLLECTIONS}
+        # Raw tables loaded from the CSV exports, keyed by table name
+        self.tables = {}
+        self.production_stats = ProductionStatsEngine()
+        self.joins = JoinEngine(self)
+        self._by_id = {}
+        self._by_name = {}
+        self._numeric = {}
+        self.search_index = InvertedIndex()
+        self.site_index = GridIndex()
+        # (mining_sites version, SiteTable) built on first analytical query
+        self._site_table = None
+        self._site_clusters = None
+        # Snapshot-backed collections serve id lookups straight from the mapping
+        # and only build their hash indexes when another lookup first needs them
+        self._stale = set()
+        # Held while indexes are built aside and swapped in, and while a reader picks up
+        # indexes that have to agree with each other
+        self._index_lock = threading.RLock()
+        if snapshot is None:
+            self.rebuild_indexes()
+        else:
+            self._stale.update(self.COLLECTIONS)
+
+    @classmethod
+    def from_snapshot(cls, path):
+        """Create a DataManager reading its records from a memory-mapped snapshot"""
+        from snapshot import Snapshot
+        snapshot = Snapshot(path)
+        collections = snapshot.collections
+        return cls(
+            collections['minerals'], collections['countries'],
+            collections['mining_sites'], collections['investment_opportunities'],
+            snapshot=snapshot
+        )
+
+    @property
+    def minerals(self):
+        return self.collections['minerals']
+
+    @property
+    def countries(self):
+        return self.collections['countries']
+
+    @property
+    def mining_sites(self):
+        return self.collections['mining_sites']
+
+    @property
+    def investment_opportunities(self):
+        return self.collections['investment_opportunities']
+
+    def rebuild_indexes(self, collection=None):
+        """Rebuild the hash indexes for one collection (or all of them)"""
+        names = [collection] if collection else self.COLLECTIONS
+        for name in names:
+            self._build_indexes(name)
+            self._touch(name)
+
+    def _touch(self, name):
+        self.versions[name] = self.versions.get(name, 0) + 1
+        self.modified[name] = time.time()
+
+    def _build_indexes(self, collection):
+        # Request threads keep reading the old indexes (or the snapshot) until the new ones
+        # are complete, and the collection only stops being stale once they are in place
+        indexes = {'by_id': {}, 'by_name': {}, 'numeric': {}}
+        if collection == 'mining_sites':
+            indexes.update(grid=GridIndex(), by_pair={}, by_mineral={}, by_country={})
+        with self._index_lock:
+            search_index = self.search_index
+            if collection in SEARCH_FIELDS:
+                search_index = search_index.without(collection)
+            for record in self.collections[collection]:
+                self._index_record(collection, record, indexes, search_index)
+            self._by_id[collection] = indexes['by_id']
+            self._by_name[collection] = indexes['by_name']
+            self._numeric[collection] = indexes['numeric']
+            self.search_index = search_index
+            if collection == 'mining_sites':
+                self.site_index = indexes['grid']
+                self._sites_by_pair = indexes['by_pair']
+                self._sites_by_mineral = indexes['by_mineral']
+                self._sites_by_country = indexes['by_country']
+            self._stale.discard(collection)
+
+    def _ensure_indexes(self, collection):
+        if collection in self._stale:
+            with self._index_lock:
+                # Another thread may have built them while this one waited
+                if collection in self._stale:
+                    self._build_indexes(collection)
+
+    def _lookup_id(self, collection, record_id):
+        if collection in self._stale:
+            return self.collections[collection].get_by_id(record_id)
+        return self._by_id[collection].get(record_id)
+
+    def _current_indexes(self, collection):
+        indexes = {
+            'by_id': self._by_id[collection],
+            'by_name': self._by_name[collection],
+            'numeric': self._numeric[collection]
+        }
+        if collection == 'mining_sites':
+            indexes.update(
+                grid=self.site_index, by_pair=self._sites_by_pair,
+                by_mineral=self._sites_by_mineral, by_country=self._sites_by_country
+            )
+        return indexes
+
+    def _index_record(self, collection, record, indexes, search_index):
+        """Add a single record to a collection's indexes"""
+        indexes['by_id'][record['id']] = record
+        indexes['numeric'][record['id']] = normalize_record(collection, record)
+        if collection in SEARCH_FIELDS:
+            search_index.add(collection, record)
+        name = record.get('name')
+        if name:
+            indexes['by_name'][name.lower()] = record
+        if collection == 'mining_sites':
+            mineral = record['mineral'].lower()
+            country = record['country'].lower()
+            indexes['by_pair'].setdefault((mineral, country), []).append(record)
+            indexes['by_mineral'].setdefault(mineral, []).append(record)
+            indexes['by_country'].setdefault(country, []).append(record)
+            if record.get('lat') is not None and record.get('lng') is not None:
+                indexes['grid'].insert(record['id'], record['lat'], record['lng'])
+
+    def add_record(self, collection, record):
+        """Append a record to a collection and index it"""
+        self._ensure_indexes(collection)
+        if not isinstance(self.collections[collection], list):
+            # Snapshot collections are read-only; copy them out on first write
+            self.collections[collection] = list(self.collections[collection])
+        record = as_record(collection, record)
+        if record['id'] in self._by_id[collection]:
+            raise ValueError(f"Duplicate id {record['id']} in {collection}")
+        with self._index_lock:
+            self.collections[collection].append(record)
+            self._index_record(collection, record, self._current_indexes(collection), self.search_index)
+        self._touch(collection)
+
+    def bulk_insert(self, table, rows):
+        """Insert a batch of rows into a collection or raw table"""
+        if table in self.COLLECTIONS:
+            for row in rows:
+                self.add_record(table, row)
+            return
+        self.tables.setdefault(table, []).extend(rows)
+        if table == 'production_stats':
+            self.production_stats.insert_many(rows)
+        self._touch(table)
+
+    def get_table(self, table):
+        """Get the rows of a raw table (empty if it was never loaded)"""
+        return self.tables.get(table, [])
+
+    def count(self, collection):
+        """Count the records in a collection"""
+        return len(self.collections[collection])
+
+    def replace_collection(self, collection, records):
+        """Replace a whole collection and rebuild its indexes"""
+        self.collections[collection] = [as_record(collection, record) for record in records]
+        self.rebuild_indexes(collection)
+
+    def data_version(self, collection=None):
+        """Get the version counter of a collection (or the sum over all)"""
+        if collection:
+            return self.versions.get(collection, 0)
+        return sum(self.versions.values())
+
+    def get_numeric(self, collection, record_id, field=None):
+        """Get the parsed numeric view of a record (or one Quantity of it)"""
+        self._ensure_indexes(collection)
+        numeric = self._numeric[collection].get(record_id, {})
+        if field:
+            return numeric.get(field)
+        return numeric
+
+    def find_in_range(self, collection, field, minimum=None, maximum=None):
+        """Get records whose parsed numeric field lies within [minimum, maximum]"""
+        self._ensure_indexes(collection)
+        numeric = self._numeric[collection]
+        results = []
+        for record in self.collections[collection]:
+            quantity = numeric[record['id']].get(field)
+            if quantity is None:
+                continue
+            if minimum is not None and quantity.value < minimum:
+                continue
+            if maximum is not None and quantity.value > maximum:
+                continue
+            results.append(record)
+        return results
+
+    def get_mineral_by_id(self, mineral_id):
+        """Get a mineral by its id"""
+        return self._lookup_id('minerals', mineral_id)
+
+    def get_mineral_by_name(self, name):
+        """Get a mineral by its name (case-insensitive)"""
+        self._ensure_indexes('minerals')
+        return self._by_name['minerals'].get(name.lower())
+
+    def get_country_by_id(self, country_id):
+        """Get a country by its id"""
+        return self._lookup_id('countries', country_id)
+
+    def get_country_by_name(self, name):
+        """Get a country by its name (case-insensitive)"""
+        self._ensure_indexes('countries')
+        return self._by_name['countries'].get(name.lower())
+
+    def get_mining_site_by_id(self, site_id):
+        """Get a mining site by its id"""
+        return self._lookup_id('mining_sites', site_id)
+
+    def get_mining_site_by_name(self, name):
+        """Get a mining site by its name (case-insensitive)"""
+        self._ensure_indexes('mining_sites')
+        return self._by_name['mining_sites'].get(name.lower())
+
+    def get_investment_opportunity_by_id(self, opportunity_id):
+        """Get an investment opportunity by its id"""
+        return self._lookup_id('investment_opportunities', opportunity_id)
+
+    def get_production_trends(self, mineral=None, country=None):
+        """Get mining sites filtered by mineral and/or country"""
+        self._ensure_indexes('mining_sites')
+        if mineral is None and country is None:
+            return list(self.mining_sites)
+        if mineral is None:
+            return list(self._sites_by_country.get(country.lower(), []))
+        if country is None:
+            return list(self._sites_by_mineral.get(mineral.lower(), []))
+        return list(self._sites_by_pair.get((mineral.lower(), country.lower()), []))
+
+    def index_lookup(self, collection, field, value):
+        """Records matching field == value through a hash index, or None if the field has none"""
+        self._ensure_indexes(collection)
+        if field == 'id':
+            try:
+                record = self._lookup_id(collection, int(value))
+            except (TypeError, ValueError):
+                return []
+            return [record] if record is not None else []
+        if field == 'name':
+            record = self._by_name[collection].get(str(value).lower())
+            return [record] if record is not None else []
+        if collection == 'mining_sites' and field in ('mineral', 'country'):
+            index = self._sites_by_mineral if field == 'mineral' else self._sites_by_country
+            return list(index.get(str(value).lower(), []))
+        return None
+
+    def get_sites_in_bbox(self, west, south, east, north):
+        """Get mining sites inside a bounding box"""
+        self._ensure_indexes('mining_sites')
+        with self._index_lock:
+            sites, grid = self._by_id['mining_sites'], self.site_index
+        return [sites[site_id] for site_id in sorted(grid.query_bbox(west, south, east, north))]
+
+    def get_nearest_sites(self, lat, lng, k=5):
+        """Get the k mining sites closest to a point as (distance_km, site) pairs"""
+        self._ensure_indexes('mining_sites')
+        with self._index_lock:
+            sites, grid = self._by_id['mining_sites'], self.site_index
+        return [(distance, sites[site_id]) for distance, site_id in grid.nearest(lat, lng, k)]
+
+    @property
+    def site_table(self):
+        """Columnar view of the mining sites, rebuilt when the sites change"""
+        self._ensure_indexes('mining_sites')
+        version = self.versions['mining_sites']
+        if self._site_table is None or self._site_table[0] != version:
+            numeric = self._numeric['mining_sites']
+            table = SiteTable.from_records(
+                self.mining_sites, lambda site_id, field: numeric[site_id].get(field)
+            )
+            self._site_table = (version, table)
+        return self._site_table[1]
+
+    @property
+    def site_clusters(self):
+        """Per-zoom site clusters, discarded when the sites change"""
+        self._ensure_indexes('mining_sites')
+        version = self.versions['mining_sites']
+        if self._site_clusters is None or self._site_clusters[0] != version:
+            self._site_clusters = (version, SiteClusters(self.mining_sites))
+        return self._site_clusters[1]
+
+    def query_sites(self, filters=None, sort=None, descending=False):
+        """Filter and sort mining sites with vectorized column masks"""
+        table = self.site_table
+        sites = self._by_id['mining_sites']
+        return [sites[int(site_id)] for site_id in table.ids[table.select(filters, sort, descending)]]
+
+    def aggregate_sites(self, by, column=None, agg='count', filters=None):
+        """Group mining sites by a categorical column and aggregate a numeric one"""
+        return self.site_table.group_by(by, column, agg, filters)
+
+    def search(self, query, collections=None, limit=None):
+        """Ranked full-text search over minerals, countries and mining sites"""
+        collections = collections or tuple(SEARCH_FIELDS)
+        for collection in collections:
+            self._ensure_indexes(collection)
+        with self._index_lock:
+            by_id, search_index = dict(self._by_id), self.search_index
+        return [
+            {
+                'type': collection,
+                'id': record_id,
+                'score': round(score, 4),
+                'record': by_id[collection][record_id]
+            }
+            for (collection, record_id), score in search_index.search(query, collections, limit)
+        ]
+
+    def search_minerals(self, query):
+        """Search minerals whose name or description contains the query (case-insensitive, like the SQLite mirror)"""
+        self._ensure_indexes('minerals')
+        with self._index_lock:
+            minerals, search_index = self._by_id['minerals'], self.search_index
+        query = query.lower()
+        # The index narrows the minerals down to those whose words contain the query's words
+        ids = search_index.containing(query, 'minerals')
+        candidates = minerals.values() if ids is None else [minerals[mineral_id] for mineral_id in ids]
+        matches = [
+            mineral for mineral in candidates
+            if query in (mineral['name'] or '').lower() or query in (mineral.get('description') or '').lower()
+        ]
+        return sorted(matches, key=lambda mineral: mineral['id'])
+
+# Global data manager instance, memory-mapped from MINERALS_SNAPSHOT when that file exists
+SNAPSHOT_PATH = os.environ.get('MINERALS_SNAPSHOT')
+if SNAPSHOT_PATH and os.path.exists(SNAPSHOT_PATH):
+    data_manager = DataManager.from_snapshot(SNAPSHOT_PATH)
+else:
+    data_manager = DataManager(MINERALS, COUNTRIES, MINING_SITES, INVESTMENT_OPPORTUNITIES)
+
+# STORAGE BACKEND SELECTION
+
+# 'memory' serves the indexed Python lists; 'sqlite-mirror' copies them into SQLite and serves the
+# plain lookups from there. It mirrors the in-memory data rather than replacing it, so the query
+# API, bbox, nearest, search and map functions always run on the in-memory indexes
+STORAGE_CONFIG = {
+    'backend': os.environ.get('MINERALS_STORAGE_BACKEND', 'memory'),
+    'sqlite_path': os.environ.get('MINERALS_SQLITE_PATH', ':memory:')
+}
+
+storage = data_manager
+
+def configure_storage(backend=None, sqlite_path=None):
+    """Select the storage backend used by the module-level query functions"""
+    global storage
+    backend = backend or STORAGE_CONFIG['backend']
+    if backend == 'memory':
+        storage = data_manager
+    elif backend == 'sqlite-mirror':
+        from sqlite_mirror import SQLiteMirror
+        storage = SQLiteMirror(sqlite_path or STORAGE_CONFIG['sqlite_path']).load_from(data_manager)
+    else:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    STORAGE_CONFIG['backend'] = backend
+    return storage
+
+def get_collection_version(collection):
+    """Get a key that changes whenever a collection's data (or the storage backend) changes"""
+    return (id(storage), storage.data_version(collection), data_manager.data_version(collection))
+
+def get_last_modified(collections):
+    """Get the epoch time of the latest change to any of the collections (None if unknown)"""
+    times = [
+        source.modified[name] for source in (storage, data_manager)
+        for name in collections if name in getattr(source, 'modified', {})
+    ]
+    return max(times) if times else None
+
 def load_mineral_data():
     """Load all mineral data"""
-    return MINERALS
+    return storage.minerals
 
 def get_country_profile(country_name):
     """Get specific country profile"""
-    for country in COUNTRIES:
-        if country['name'].lower() == country_name.lower():
-            return country
-    return None
+    return storage.get_country_by_name(country_name)
 
 def get_production_trends(mineral=None, country=None):
     """Get production trends with optional filters"""
-    trends = []
-    for site in MINING_SITES:
-        if (mineral is None or site['mineral'].lower() == mineral.lower()) and \
-           (country is None or site['country'].lower() == country.lower()):
-            trends.append(site)
-    return trends
+    return storage.get_production_trends(mineral, country)
 
 def get_all_minerals():
     """Get all minerals"""
-    return MINERALS
+    return storage.minerals
 
 def search_minerals(query):
     """Search minerals by name or description"""
-    results = []
-    for mineral in MINERALS:
-        if query.lower() in mineral['name'].lower() or query.lower() in mineral['description'].lower():
-            results.append(mineral)
-    return results
+    return storage.search_minerals(query)
+
+def search_all(query, collections=None, limit=None):
+    """Ranked search across minerals, countries and mining sites"""
+    return data_manager.search(query, collections, limit)
+
+def get_mining_sites_in_bbox(west, south, east, north):
+    """Get mining sites inside a 'west,south,east,north' bounding box"""
+    return data_manager.get_sites_in_bbox(west, south, east, north)
+
+def get_nearest_mining_sites(lat, lng, k=5):
+    """Get the k nearest mining sites to a point, each with its distance in km"""
+    return [
+        dict(site, distance_km=round(distance, 3))
+        for distance, site in data_manager.get_nearest_sites(lat, lng, k)
+    ]
+
+def aggregate_mining_sites(by, column=None, agg='count', filters=None):
+    """Aggregate mining sites per mineral, country, status or operator"""
+    return data_manager.aggregate_sites(by, column, agg, filters)
+
+def get_production_stats_trend(country=None, mineral=None, window=3):
+    """Get yearly production with year-over-year growth and moving averages"""
+    return data_manager.production_stats.trend(country, mineral, window)
+
+def get_production_stats_rollup(dimension, year=None):
+    """Get production totals per country, mineral or year"""
+    return data_manager.production_stats.rollup(dimension, year)
+
+def query_collection(collection, args):
+    """Filter, sort, project and page a collection from request arguments"""
+    return QueryPlanner(data_manager).execute(CollectionQuery.from_args(collection, args))
+
+def get_site_clusters(zoom, bbox=None):
+    """Get mining site clusters for a map zoom level, optionally inside a bbox"""
+    return data_manager.site_clusters.clusters(zoom, bbox)
+
+# Tiles holding more sites than this are served as clusters instead
+MAX_TILE_SITES = 256
+
+def get_site_tile(zoom, x, y):
+    """Get the mining sites in a slippy-map tile as GeoJSON (clustered when the tile is crowded)"""
+    sites = [
+        site for site in data_manager.get_sites_in_bbox(*tile_bbox(zoom, x, y))
+        if tile_of(site['lat'], site['lng'], zoom) == (x, y)
+    ]
+    if len(sites) <= MAX_TILE_SITES or zoom > MAX_CLUSTER_ZOOM:
+        return feature_collection(sites=sites, summary=True)
+    clusters = data_manager.site_clusters.tile_clusters(zoom, x, y)
+    return feature_collection(
+        sites=[cluster['site'] for cluster in clusters if cluster['count'] == 1],
+        clusters=[cluster for cluster in clusters if cluster['count'] > 1],
+        summary=True
+    )
+
+def get_map_features(layers=('countries', 'sites'), bbox=None, summary=False):
+    """Get countries and mining sites (optionally inside a bbox) as a GeoJSON FeatureCollection"""
+    countries = storage.countries if 'countries' in layers else ()
+    sites = ()
+    if 'sites' in layers:
+        sites = data_manager.get_sites_in_bbox(*bbox) if bbox else storage.mining_sites
+    return feature_collection(countries, sites, summary=summary)
+
+def get_joined_sites(source='sites', mineral=None, country=None):
+    """Get sites joined to their country and mineral records"""
+    return data_manager.joins.joined_sites(source, mineral, country)
+
+def get_mineral_by_id(mineral_id):
+    """Get a mineral by id"""
+    return storage.get_mineral_by_id(mineral_id)
+
+def get_country_by_id(country_id):
+    """Get a country by id"""
+    return storage.get_country_by_id(country_id)
+
+def get_mining_site_by_id(site_id):
+    """Get a mining site by id"""
+    return storage.get_mining_site_by_id(site_id)
 
 def get_all_countries():
     """Get all countries"""
-    return COUNTRIES
+    return storage.countries
 
 def get_all_mining_sites():
     """Get all mining sites"""
-    return MINING_SITES
+    return storage.mining_sites
 
 def get_market_intelligence():
     """Get market intelligence data"""
@@ -304,14 +830,14 @@ def get_market_intelligence():
 
 def get_investment_opportunities():
     """Get investment opportunities"""
-    return INVESTMENT_OPPORTUNITIES
+    return storage.investment_opportunities
 
 def get_platform_stats():
     """Get platform statistics"""
     return {
-        "minerals_count": len(MINERALS),
-        "countries_count": len(COUNTRIES),
-        "mining_sites_count": len(MINING_SITES),
+        "minerals_count": storage.count('minerals'),
+        "countries_count": storage.count('countries'),
+        "mining_sites_count": storage.count('mining_sites'),
         "market_news_count": len(MARKET_INTELLIGENCE['market_news']),
-        "investment_opportunities_count": len(INVESTMENT_OPPORTUNITIES)
-  }
+        "investment_opportunities_count": storage.count('investment_opportunities')
+    }
@@ -0,0 +1,64 @@
+# Napo Joy  Serobele: Application Integration - HTTP Validators
+
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import request, make_response
+
+from data_manager import get_collection_version, get_last_modified
+
+# Data versions restart at zero with the process, so every ETag also carries the boot time
+BOOT_TIME = time.time()
+
+
+def compute_etag(collections, vary=None):
+    """Strong ETag from the request path, the collections' data versions and any per-user state"""
+    parts = [repr(BOOT_TIME), request.full_path]
+    parts.extend(repr(get_collection_version(name)) for name in collections)
+    if vary is not None:
+        parts.append(repr(vary()))
+    return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def last_modified_time(collections):
+    """Last-Modified for a response built from the collections (whole seconds, UTC)"""
+    modified = get_last_modified(collections) or BOOT_TIME
+    return datetime.fromtimestamp(int(modified), timezone.utc)
+
+
+def is_fresh(etag, last_modified, vary=None):
+    """Whether the client's cached copy is still current"""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    # Per-user responses can change without the data changing, so only the ETag can validate them
+    if request.if_modified_since and vary is None:
+        return request.if_modified_since >= last_modified
+    return False
+
+
+def conditional_get(*collections, vary=None):
+    """Decorator answering GETs with 304 Not Modified, without calling the view, while the data is unchanged"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+            last_modified = last_modified_time(collections)
+            etag = compute_etag(collections, vary)
+            if is_fresh(etag, last_modified, vary):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                # The view may have changed per-user state (e.g. the activity log), so tag what was sent
+                if vary is not None:
+                    etag = compute_etag(collections, vary)
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,92 @@
+# MRMODEPEKHALEMO: Data Management - Site Joins
+
+class JoinedSite:
+    """A site joined to its country and mineral records by reference, not by copy"""
+
+    __slots__ = ('site', 'country', 'mineral')
+
+    def __init__(self, site, country, mineral):
+        self.site = site
+        self.country = country
+        self.mineral = mineral
+
+    def to_dict(self):
+        return {'site': self.site, 'country': self.country, 'mineral': self.mineral}
+
+
+# How each site source refers to its country and mineral:
+# (where the rows live, country key column, mineral key column, lookup by id or name)
+JOIN_SOURCES = {
+    # sites.csv carries CountryID / MineralID foreign keys
+    'sites': ('table', 'CountryID', 'MineralID', 'id'),
+    # The curated mining_sites list denormalizes country and mineral names
+    'mining_sites': ('collection', 'country', 'mineral', 'name')
+}
+
+
+class JoinEngine:
+    """Hash joins from site rows to countries and minerals, cached per data version"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self._cache = {}
+
+    def _version(self, source):
+        manager = self.manager
+        return (
+            manager.data_version(source),
+            manager.data_version('countries'),
+            manager.data_version('minerals')
+        )
+
+    def _build(self, source):
+        kind, country_key, mineral_key, lookup = JOIN_SOURCES[source]
+        manager = self.manager
+        rows = manager.get_table(source) if kind == 'table' else manager.collections[source]
+        if lookup == 'id':
+            find_country, find_mineral = manager.get_country_by_id, manager.get_mineral_by_id
+        else:
+            find_country, find_mineral = manager.get_country_by_name, manager.get_mineral_by_name
+        views = []
+        by_country = {}
+        by_mineral = {}
+        for row in rows:
+            # Each probe is a dict lookup in an index DataManager already maintains
+            country = find_country(row[country_key]) if row.get(country_key) is not None else None
+            mineral = find_mineral(row[mineral_key]) if row.get(mineral_key) is not None else None
+            view = JoinedSite(row, country, mineral)
+            views.append(view)
+            if country is not None:
+                by_country.setdefault(country['id'], []).append(view)
+            if mineral is not None:
+                by_mineral.setdefault(mineral['id'], []).append(view)
+        return views, by_country, by_mineral
+
+    def _views(self, source):
+        version = self._version(source)
+        cached = self._cache.get(source)
+        if cached is None or cached[0] != version:
+            cached = (version,) + self._build(source)
+            self._cache[source] = cached
+        return cached[1:]
+
+    def joined_sites(self, source='sites', mineral=None, country=None):
+        """Get joined site views, optionally restricted to a mineral and/or country name"""
+        if source not in JOIN_SOURCES:
+            raise ValueError(f"Unknown join source: {source}")
+        views, by_country, by_mineral = self._views(source)
+        candidates = views
+        if mineral is not None:
+            record = self.manager.get_mineral_by_name(mineral)
+            candidates = by_mineral.get(record['id'], []) if record else []
+        if country is not None:
+            record = self.manager.get_country_by_name(country)
+            country_id = record['id'] if record else None
+            if mineral is None:
+                candidates = by_country.get(country_id, [])
+            else:
+                candidates = [
+                    view for view in candidates
+                    if view.country is not None and view.country['id'] == country_id
+                ]
+        return list(candidates)
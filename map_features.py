@@ -0,0 +1,71 @@
+# Khutsiso Teffo: Visualization - Map Features (GeoJSON)
+
+from records import as_dict
+
+MAP_LAYERS = ('countries', 'sites')
+
+# Properties kept in summary features; the map fetches the rest when a marker is clicked
+SUMMARY_FIELDS = ('id', 'name', 'mineral', 'status')
+
+
+def parse_layers(text):
+    """Parse a 'countries,sites' layer list (default: every layer)"""
+    if not text:
+        return MAP_LAYERS
+    layers = tuple(layer.strip() for layer in text.split(',') if layer.strip())
+    unknown = [layer for layer in layers if layer not in MAP_LAYERS]
+    if unknown:
+        raise ValueError(f"Unknown map layers: {', '.join(unknown)}")
+    return layers
+
+
+def point_feature(kind, record, lat, lng, properties):
+    """GeoJSON Point feature; coordinates are [longitude, latitude]"""
+    return {
+        'type': 'Feature',
+        'id': f"{kind}-{record['id']}",
+        'geometry': {'type': 'Point', 'coordinates': [lng, lat]},
+        'properties': dict(properties, kind=kind)
+    }
+
+
+def _properties(record, skip, summary):
+    if summary:
+        return {key: record.get(key) for key in SUMMARY_FIELDS if record.get(key) is not None}
+    return {key: value for key, value in as_dict(record).items() if key not in skip}
+
+
+def country_feature(country, summary=False):
+    coordinates = country.get('coordinates') or {}
+    properties = _properties(country, ('coordinates',), summary)
+    return point_feature('country', country, coordinates.get('lat'), coordinates.get('lng'), properties)
+
+
+def site_feature(site, summary=False):
+    properties = _properties(site, ('lat', 'lng'), summary)
+    return point_feature('site', site, site.get('lat'), site.get('lng'), properties)
+
+
+def cluster_feature(cluster):
+    """Point feature for a cluster of sites, with its count and dominant mineral"""
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [cluster['lng'], cluster['lat']]},
+        'properties': {
+            'kind': 'cluster', 'count': cluster['count'], 'dominant_mineral': cluster['dominant_mineral']
+        }
+    }
+
+
+def feature_collection(countries=(), sites=(), clusters=(), summary=False):
+    """FeatureCollection of country, mining site and cluster points, skipping records without coordinates"""
+    features = [
+        country_feature(country, summary) for country in countries
+        if (country.get('coordinates') or {}).get('lat') is not None
+    ]
+    features.extend(
+        site_feature(site, summary) for site in sites
+        if site.get('lat') is not None and site.get('lng') is not None
+    )
+    features.extend(cluster_feature(cluster) for cluster in clusters)
+    return {'type': 'FeatureCollection', 'features': features}
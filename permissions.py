@@ -0,0 +1,71 @@
+# Thatoyaone: Authentication & Security - Permission Bitmasks
+
+# Every permission gets one bit; a role is the OR of its permissions' bits
+PERMISSIONS = (
+    'read', 'write', 'delete', 'manage_users', 'view_reports',
+    'export_data', 'view_investments', 'view_market_data', 'add_insights'
+)
+PERMISSION_BITS = {name: 1 << index for index, name in enumerate(PERMISSIONS)}
+ALL_PERMISSIONS = (1 << len(PERMISSIONS)) - 1
+
+# Explicit permissions per role; admin holds every permission, so it passes every check
+BUILTIN_ROLES = {
+    'admin': list(PERMISSIONS),
+    'investor': ['read', 'export_data', 'view_investments', 'view_market_data'],
+    'researcher': ['read', 'export_data', 'view_reports', 'add_insights']
+}
+DEFAULT_PERMISSIONS = ['read']
+
+# roles.csv role names that mean a built-in role
+ROLE_ALIASES = {
+    'administrator': 'admin',
+    'investment analyst': 'investor',
+    'research specialist': 'researcher'
+}
+
+
+def permission_mask(names):
+    """OR together the bits of the named permissions"""
+    mask = 0
+    for name in names:
+        if name not in PERMISSION_BITS:
+            raise ValueError(f"Unknown permission: {name}")
+        mask |= PERMISSION_BITS[name]
+    return mask
+
+
+def permission_names(mask):
+    """The permissions set in a mask, in bit order"""
+    return [name for name in PERMISSIONS if mask & PERMISSION_BITS[name]]
+
+
+def role_key(role_name):
+    """Canonical role name for a roles.csv RoleName"""
+    key = ' '.join(role_name.lower().split())
+    return ROLE_ALIASES.get(key, key)
+
+
+def compile_roles(role_rows=()):
+    """Role -> permission bitmask for the built-in roles and every role named in roles.csv"""
+    # Permissions only come from BUILTIN_ROLES: the Permissions column of roles.csv is prose,
+    # so a role it adds without a built-in entry gets DEFAULT_PERMISSIONS
+    masks = {role: permission_mask(names) for role, names in BUILTIN_ROLES.items()}
+    for row in role_rows:
+        masks.setdefault(role_key(row['RoleName']), permission_mask(DEFAULT_PERMISSIONS))
+    return masks
+
+
+ROLE_MASKS = compile_roles()
+DEFAULT_MASK = permission_mask(DEFAULT_PERMISSIONS)
+
+
+def load_roles(role_rows):
+    """Recompile the role masks with the rows of roles.csv"""
+    ROLE_MASKS.clear()
+    ROLE_MASKS.update(compile_roles(role_rows))
+    return ROLE_MASKS
+
+
+def role_mask(role):
+    """Permission bitmask for a role (read-only for unknown roles)"""
+    return ROLE_MASKS.get(role, DEFAULT_MASK)
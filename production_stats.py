@@ -0,0 +1,118 @@
+# MRMODEPEKHALEMO: Data Management - Production Statistics
+
+MEASURES = ('production_tonnes', 'export_value_million_usd')
+
+
+class ProductionStatsEngine:
+    """Country x mineral x year production series with rollups maintained on insert"""
+
+    def __init__(self):
+        # (country, mineral, year) -> [tonnes, export value]; names are lowercased keys
+        self._facts = {}
+        # Per-year series for each country, each mineral, each pair and the overall total
+        self._by_country = {}
+        self._by_mineral = {}
+        self._by_pair = {}
+        self._totals = {}
+        # All-years totals per country and per mineral
+        self._country_totals = {}
+        self._mineral_totals = {}
+        self._labels = {}
+        self.version = 0
+
+    def __len__(self):
+        return len(self._facts)
+
+    def _label(self, name):
+        key = name.strip().lower()
+        self._labels.setdefault(key, name.strip())
+        return key
+
+    def _apply(self, country, mineral, year, delta):
+        for series in (
+            self._by_country.setdefault(country, {}),
+            self._by_mineral.setdefault(mineral, {}),
+            self._by_pair.setdefault((country, mineral), {}),
+            self._totals
+        ):
+            totals = series.setdefault(year, [0.0, 0.0])
+            totals[0] += delta[0]
+            totals[1] += delta[1]
+        for totals in (
+            self._country_totals.setdefault(country, [0.0, 0.0]),
+            self._mineral_totals.setdefault(mineral, [0.0, 0.0])
+        ):
+            totals[0] += delta[0]
+            totals[1] += delta[1]
+
+    def insert(self, row):
+        """Add or replace one country/mineral/year fact and update every rollup"""
+        country = self._label(row['country'])
+        mineral = self._label(row['mineral'])
+        year = int(row['year'])
+        values = [float(row.get(measure) or 0) for measure in MEASURES]
+        key = (country, mineral, year)
+        previous = self._facts.get(key)
+        if previous is not None:
+            self._apply(country, mineral, year, [-previous[0], -previous[1]])
+        self._facts[key] = values
+        self._apply(country, mineral, year, values)
+        self.version += 1
+
+    def insert_many(self, rows):
+        for row in rows:
+            self.insert(row)
+
+    def _series(self, country=None, mineral=None):
+        if country and mineral:
+            return self._by_pair.get((country.lower(), mineral.lower()), {})
+        if country:
+            return self._by_country.get(country.lower(), {})
+        if mineral:
+            return self._by_mineral.get(mineral.lower(), {})
+        return self._totals
+
+    def rollup(self, dimension, year=None):
+        """Totals per country, mineral or year (optionally for a single year)"""
+        if dimension == 'year':
+            years = [year] if year is not None else sorted(self._totals)
+            groups = {str(y): self._totals[y] for y in years if y in self._totals}
+        elif dimension in ('country', 'mineral'):
+            series = self._by_country if dimension == 'country' else self._by_mineral
+            if year is None:
+                totals = self._country_totals if dimension == 'country' else self._mineral_totals
+                groups = {self._labels[key]: values for key, values in totals.items()}
+            else:
+                groups = {
+                    self._labels[key]: by_year[year]
+                    for key, by_year in series.items() if year in by_year
+                }
+        else:
+            raise ValueError(f"Unknown dimension: {dimension}")
+        return {
+            label: {MEASURES[0]: values[0], MEASURES[1]: values[1]}
+            for label, values in groups.items()
+        }
+
+    def trend(self, country=None, mineral=None, window=3):
+        """Yearly series with year-over-year growth and a trailing moving average"""
+        series = self._series(country, mineral)
+        rows = []
+        history = []
+        previous = None
+        for year in sorted(series):
+            tonnes, value = series[year]
+            history.append(tonnes)
+            recent = history[-window:]
+            growth = None
+            if previous is not None and previous[0] == year - 1 and previous[1]:
+                growth = round((tonnes - previous[1]) / previous[1] * 100, 2)
+            rows.append({
+                'year': year,
+                MEASURES[0]: tonnes,
+                MEASURES[1]: value,
+                'yoy_growth_percent': growth,
+                'moving_average_tonnes': round(sum(recent) / len(recent), 2)
+            })
+            previous = (year, tonnes)
+        return rows
@@ -0,0 +1,221 @@
+# MRMODEPEKHALEMO: Data Management - Collection Queries
+
+import base64
+import json
+
+from records import RECORD_TYPES
+from spatial_index import longitude_ranges, parse_bbox
+
+# Query parameters that are not field filters
+RESERVED_PARAMS = ('sort', 'fields', 'limit', 'cursor', 'count_only', 'bbox', 'explain')
+# Parameters starting with this (e.g. jQuery's _=<timestamp> cache-buster) are ignored
+IGNORED_PREFIX = '_'
+
+OPERATORS = ('gte', 'gt', 'lte', 'lt', 'ne', 'in')
+
+MAX_LIMIT = 1000
+
+
+class QueryError(ValueError):
+    """Raised for malformed collection queries"""
+
+
+def truthy(value):
+    """Whether a flag parameter such as ?explain=1 is switched on"""
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def query_params(args):
+    """The (key, value) pairs of request args that take part in a query"""
+    return [(key, value) for key, value in args.items(multi=True) if not key.startswith(IGNORED_PREFIX)]
+
+
+def encode_cursor(offset):
+    """Opaque pagination cursor for a result offset"""
+    return base64.urlsafe_b64encode(json.dumps({'offset': offset}).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))['offset']
+    except (ValueError, KeyError, TypeError):
+        raise QueryError("Invalid cursor")
+    if not isinstance(offset, int) or offset < 0:
+        raise QueryError("Invalid cursor")
+    return offset
+
+
+class CollectionQuery:
+    """Filters, sort keys, projection and paging parsed from request arguments"""
+
+    def __init__(self, collection, filters=None, sort=None, fields=None, limit=None,
+                 offset=0, count_only=False, bbox=None, explain=False):
+        self.collection = collection
+        self.filters = filters or []
+        self.sort = sort or []
+        self.fields = fields
+        self.limit = limit
+        self.offset = offset
+        self.count_only = count_only
+        self.bbox = bbox
+        self.explain = explain
+
+    @classmethod
+    def from_args(cls, collection, args):
+        """Parse e.g. ?status=Active&production_gte=10000&sort=-production&fields=id,name&limit=10"""
+        known = RECORD_TYPES[collection].FIELDS
+        filters = []
+        for key, value in args.items():
+            if key in RESERVED_PARAMS or key.startswith(IGNORED_PREFIX):
+                continue
+            field, operator = key, 'eq'
+            head, _, tail = key.rpartition('_')
+            if tail in OPERATORS and head in known:
+                field, operator = head, tail
+            if field not in known:
+                raise QueryError(f"Unknown filter field: {field}")
+            if operator in ('gte', 'gt', 'lte', 'lt'):
+                try:
+                    value = float(value)
+                except ValueError:
+                    raise QueryError(f"{key} must be a number")
+            elif operator == 'in':
+                value = [item.strip() for item in value.split(',')]
+            filters.append((field, operator, value))
+
+        sort = []
+        for key in filter(None, (args.get('sort') or '').split(',')):
+            descending = key.startswith('-')
+            field = key.lstrip('-+')
+            if field not in known:
+                raise QueryError(f"Unknown sort field: {field}")
+            sort.append((field, descending))
+
+        fields = None
+        if args.get('fields'):
+            fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+            unknown = [field for field in fields if field not in known]
+            if unknown:
+                raise QueryError(f"Unknown fields: {', '.join(unknown)}")
+
+        limit = None
+        if args.get('limit'):
+            try:
+                limit = int(args['limit'])
+            except ValueError:
+                raise QueryError("limit must be an integer")
+            if not 0 < limit <= MAX_LIMIT:
+                raise QueryError(f"limit must be between 1 and {MAX_LIMIT}")
+
+        bbox = None
+        if args.get('bbox'):
+            if collection != 'mining_sites':
+                raise QueryError("bbox is only supported for mining sites")
+            try:
+                bbox = parse_bbox(args['bbox'])
+            except ValueError as error:
+                raise QueryError(str(error))
+
+        offset = decode_cursor(args['cursor']) if args.get('cursor') else 0
+        return cls(collection, filters, sort, fields, limit, offset,
+                   truthy(args.get('count_only', '')), bbox, truthy(args.get('explain', '')))
+
+
+class QueryPlanner:
+    """Picks the narrowest index for a query, then filters, sorts and pages the candidates"""
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def _value(self, collection, record, field):
+        """Comparable value of a field, using the parsed numeric view where there is one"""
+        quantity = self.manager.get_numeric(collection, record['id'], field)
+        if quantity is not None:
+            return quantity.value
+        return record.get(field)
+
+    def _candidates(self, query):
+        """Choose the smallest candidate set any index can produce"""
+        manager = self.manager
+        options = []
+        for field, operator, value in query.filters:
+            if operator == 'eq':
+                records = manager.index_lookup(query.collection, field, value)
+                if records is not None:
+                    options.append((f'index:{field}', records))
+        if query.bbox is not None:
+            options.append(('spatial:bbox', manager.get_sites_in_bbox(*query.bbox)))
+        if query.collection == 'mining_sites':
+            ranges = {
+                f'{field}_{operator}': value for field, operator, value in query.filters
+                if operator in ('gte', 'gt', 'lte', 'lt') and field in manager.site_table.numeric
+            }
+            if ranges:
+                options.append(('columnar:' + ','.join(sorted(ranges)), manager.query_sites(ranges)))
+        if not options:
+            return 'scan', manager.collections[query.collection]
+        return min(options, key=lambda option: len(option[1]))
+
+    def _matches(self, collection, record, field, operator, value):
+        if operator in ('gte', 'gt', 'lte', 'lt'):
+            actual = self._value(collection, record, field)
+            if not isinstance(actual, (int, float)):
+                return False
+            return {
+                'gte': actual >= value, 'gt': actual > value,
+                'lte': actual <= value, 'lt': actual < value
+            }[operator]
+        actual = record.get(field)
+        wanted = [item.lower() for item in value] if operator == 'in' else [value.lower()]
+        if isinstance(actual, (list, tuple)):
+            found = any(str(item).lower() in wanted for item in actual)
+        else:
+            found = str(actual).lower() in wanted
+        return not found if operator == 'ne' else found
+
+    def execute(self, query):
+        """Run a query and return the page, total match count, next cursor and plan"""
+        collection = query.collection
+        plan, candidates = self._candidates(query)
+        records = [
+            record for record in candidates
+            if all(self._matches(collection, record, *condition) for condition in query.filters)
+            and (query.bbox is None or plan == 'spatial:bbox' or self._in_bbox(record, query.bbox))
+        ]
+        # Apply sort keys last-to-first so earlier keys take precedence (sorts are stable)
+        for field, descending in reversed(query.sort):
+            keys = {id(record): self._sort_key(collection, record, field) for record in records}
+            present = [record for record in records if keys[id(record)] is not None]
+            missing = [record for record in records if keys[id(record)] is None]
+            present.sort(key=lambda record: keys[id(record)], reverse=descending)
+            records = present + missing
+        result = {'total': len(records), 'plan': plan}
+        if query.count_only:
+            return result
+        end = query.offset + query.limit if query.limit else len(records)
+        page = records[query.offset:end]
+        if query.fields:
+            page = [{field: record.get(field) for field in query.fields} for record in page]
+        result['data'] = page
+        result['next_cursor'] = encode_cursor(end) if end < len(records) else None
+        return result
+
+    def _sort_key(self, collection, record, field):
+        """Numbers sort before text, so a field mixing the two still has a total order"""
+        value = self._value(collection, record, field)
+        if value is None:
+            return None
+        if isinstance(value, (int, float)):
+            return (0, value)
+        if isinstance(value, str):
+            return (1, value.lower())
+        raise QueryError(f"Cannot sort by {field}: it holds {type(value).__name__} values")
+
+    @staticmethod
+    def _in_bbox(record, bbox):
+        west, south, east, north = bbox
+        lat, lng = record.get('lat'), record.get('lng')
+        if lat is None or lng is None or not south <= lat <= north:
+            return False
+        ranges = longitude_ranges(west, east)
+        return ranges is None or any(low <= lng <= high for low, high in ranges)
@@ -0,0 +1,148 @@
+# MRMODEPEKHALEMO: Data Management - Record Types
+
+import sys
+
+
+def _intern(value):
+    """Intern a string, or every string in a list, so repeats share one object"""
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(sys.intern(item) if isinstance(item, str) else item for item in value)
+    return value
+
+
+class Record:
+    """Compact slotted record with read-only dict-style access"""
+
+    # Keys outside a record type's fields (extra CSV columns, admin-added fields) are kept
+    # in extra, a dict or None, and returned after the fields
+    __slots__ = ('extra',)
+    # Public field order, used for to_dict and dict-style iteration
+    FIELDS = ()
+    # Fields whose values repeat across records and are worth interning
+    INTERNED = ()
+    # Keys a record type stores itself; anything else goes to extra
+    KNOWN_KEYS = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.KNOWN_KEYS = frozenset(cls.__slots__) | frozenset(cls.FIELDS)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from a plain dict"""
+        record = cls.__new__(cls)
+        for name in cls.__slots__:
+            value = data.get(name)
+            setattr(record, name, _intern(value) if name in cls.INTERNED else value)
+        known = cls.KNOWN_KEYS
+        record.extra = {key: value for key, value in data.items() if key not in known} or None
+        return record
+
+    def to_dict(self):
+        """Convert to a JSON-ready dict"""
+        data = {name: getattr(self, name) for name in self.FIELDS}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if self.extra:
+            return self.extra.get(key, default)
+        return default
+
+    def __contains__(self, key):
+        return key in self.FIELDS or bool(self.extra) and key in self.extra
+
+    def keys(self):
+        return self.FIELDS + tuple(self.extra) if self.extra else self.FIELDS
+
+    def items(self):
+        return list(self.to_dict().items())
+
+    def __repr__(self):
+        return f"{type(self).__name__}(id={self.id!r}, name={self.get('name')!r})"
+
+
+class Mineral(Record):
+    __slots__ = (
+        'id', 'name', 'description', 'price', 'unit', 'trend', 'reserves', 'production',
+        'major_producers', 'demand_growth', 'applications', 'risk_factors'
+    )
+    FIELDS = __slots__
+    INTERNED = ('name', 'unit', 'trend', 'major_producers', 'applications', 'risk_factors')
+
+
+class Country(Record):
+    __slots__ = (
+        'id', 'name', 'capital', 'gdp', 'population', 'mining_contribution', 'key_minerals',
+        'mining_employment', 'investment_rating', 'lat', 'lng', 'area', 'mining_regulations',
+        'infrastructure', 'political_stability'
+    )
+    FIELDS = (
+        'id', 'name', 'capital', 'gdp', 'population', 'mining_contribution', 'key_minerals',
+        'mining_employment', 'investment_rating', 'coordinates', 'area', 'mining_regulations',
+        'infrastructure', 'political_stability'
+    )
+    INTERNED = (
+        'name', 'key_minerals', 'investment_rating', 'mining_regulations',
+        'infrastructure', 'political_stability'
+    )
+
+    @classmethod
+    def from_dict(cls, data):
+        coordinates = data.get('coordinates') or {}
+        return super().from_dict(dict(data, lat=coordinates.get('lat'), lng=coordinates.get('lng')))
+
+    @property
+    def coordinates(self):
+        return {'lat': self.lat, 'lng': self.lng}
+
+
+class MiningSite(Record):
+    __slots__ = (
+        'id', 'name', 'country', 'mineral', 'lat', 'lng', 'production', 'operator', 'reserves',
+        'status', 'employment', 'year_established', 'estimated_lifespan', 'environmental_rating'
+    )
+    FIELDS = __slots__
+    INTERNED = ('country', 'mineral', 'operator', 'status', 'environmental_rating')
+
+
+class InvestmentOpportunity(Record):
+    __slots__ = (
+        'id', 'title', 'country', 'mineral', 'investment_required', 'estimated_roi',
+        'risk_level', 'timeline', 'status'
+    )
+    FIELDS = __slots__
+    INTERNED = ('country', 'mineral', 'risk_level', 'timeline', 'status')
+
+
+RECORD_TYPES = {
+    'minerals': Mineral,
+    'countries': Country,
+    'mining_sites': MiningSite,
+    'investment_opportunities': InvestmentOpportunity
+}
+
+
+def as_record(collection, data):
+    """Convert a dict to the record type of its collection (records pass through)"""
+    record_type = RECORD_TYPES.get(collection)
+    if record_type is None or isinstance(data, record_type):
+        return data
+    return record_type.from_dict(data)
+
+
+def as_dict(record):
+    """Convert a record to a plain dict (dicts pass through)"""
+    return record.to_dict() if isinstance(record, Record) else record
@@ -0,0 +1,63 @@
+# Napo Joy  Serobele: Application Integration - JSON Response Cache
+
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Encoded JSON response bodies keyed by request and data version, bounded by count and total bytes"""
+
+    def __init__(self, dumps, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.dumps = dumps
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _encode(self, payload):
+        body = self.dumps(payload).encode('utf-8')
+        # Stored open-ended just before the timestamp value, so a send only appends the time
+        return body[:body.rindex(b'}')] + (b', "timestamp": "' if payload else b'"timestamp": "')
+
+    def _cached(self, key, version, build, encode):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        # Build outside the lock; a concurrent miss just encodes the same body twice
+        encoded = encode(build())
+        with self._lock:
+            self.misses += 1
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous[1])
+            # A body bigger than the whole budget is served but never stored
+            if len(encoded) <= self.max_bytes:
+                self._entries[key] = (version, encoded)
+                self.bytes += len(encoded)
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+        return encoded
+
+    def body(self, key, version, build):
+        """Get the cached prefix for key at this data version, building the payload on a miss"""
+        return self._cached(('body', key), version, build, self._encode)
+
+    def document(self, key, version, build):
+        """Get a complete cached JSON document (no timestamp) for key at this data version"""
+        return self._cached(('document', key), version, build, lambda payload: self.dumps(payload).encode('utf-8'))
+
+    def render(self, key, version, build, timestamp):
+        """Complete JSON body with the timestamp spliced in"""
+        return self.body(key, version, build) + timestamp.encode('ascii') + b'"}'
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
@@ -0,0 +1,179 @@
+# MRMODEPEKHALEMO: Data Management - Full-Text Search
+
+import bisect
+import math
+import re
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Searchable fields per collection and the weight of a match in each
+SEARCH_FIELDS = {
+    'minerals': {
+        'name': 3.0, 'description': 1.0, 'applications': 1.5,
+        'risk_factors': 1.0, 'major_producers': 1.0
+    },
+    'countries': {'name': 3.0, 'capital': 1.0, 'key_minerals': 1.5},
+    'mining_sites': {'name': 3.0, 'operator': 2.0, 'mineral': 1.5, 'country': 1.0}
+}
+
+# A term that only matches as a prefix of a word scores less than a whole-word match
+PREFIX_PENALTY = 0.7
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def parse_query(query):
+    """Parse a query into OR-separated groups of AND-ed terms"""
+    groups = [[]]
+    for word in query.split():
+        if word in ('OR', '|'):
+            groups.append([])
+        else:
+            groups[-1].extend(tokenize(word))
+    return [group for group in groups if group]
+
+
+class InvertedIndex:
+    """Token -> document postings over minerals, countries and mining sites"""
+
+    def __init__(self):
+        self._postings = {}
+        self._documents = {}
+        # Sorted vocabulary so prefix matches are a bisect range; rebuilt on the first
+        # search after tokens were added or removed, so a bulk build sorts once
+        self._vocabulary = None
+        # Trigram -> vocabulary tokens holding it, for substring lookups; rebuilt like the vocabulary
+        self._trigrams = None
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, collection, record):
+        """Index a record, replacing any earlier version of it"""
+        key = (collection, record['id'])
+        if key in self._documents:
+            self.remove(collection, record['id'])
+        weights = {}
+        for field, weight in SEARCH_FIELDS.get(collection, {}).items():
+            value = record.get(field)
+            if not value:
+                continue
+            text = ' '.join(value) if isinstance(value, (list, tuple)) else str(value)
+            for token in tokenize(text):
+                weights[token] = weights.get(token, 0.0) + weight
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                self._vocabulary = self._trigrams = None
+            postings[key] = weight
+        self._documents[key] = tuple(weights)
+
+    def remove(self, collection, record_id):
+        """Drop a record from the index"""
+        key = (collection, record_id)
+        for token in self._documents.pop(key, ()):
+            postings = self._postings[token]
+            del postings[key]
+            if not postings:
+                del self._postings[token]
+                self._vocabulary = self._trigrams = None
+
+    def remove_collection(self, collection):
+        """Drop every record of a collection from the index"""
+        for key in [key for key in self._documents if key[0] == collection]:
+            self.remove(*key)
+
+    def without(self, collection):
+        """Copy of the index minus one collection's records, leaving this index untouched"""
+        copy = InvertedIndex()
+        for key, tokens in self._documents.items():
+            if key[0] == collection:
+                continue
+            for token in tokens:
+                copy._postings.setdefault(token, {})[key] = self._postings[token][key]
+            copy._documents[key] = tokens
+        return copy
+
+    def _expand(self, term):
+        """Find vocabulary tokens starting with a term"""
+        vocabulary = self._vocabulary
+        if vocabulary is None:
+            vocabulary = self._vocabulary = sorted(self._postings)
+        start = bisect.bisect_left(vocabulary, term)
+        end = bisect.bisect_left(vocabulary, term + '\uffff')
+        return vocabulary[start:end]
+
+    def _tokens_containing(self, term):
+        """Find vocabulary tokens that contain a term anywhere"""
+        if len(term) < 3:
+            return [token for token in list(self._postings) if term in token]
+        trigrams = self._trigrams
+        if trigrams is None:
+            trigrams = {}
+            for token in list(self._postings):
+                for start in range(len(token) - 2):
+                    trigrams.setdefault(token[start:start + 3], set()).add(token)
+            self._trigrams = trigrams
+        candidates = None
+        for start in range(len(term) - 2):
+            tokens = trigrams.get(term[start:start + 3], set())
+            candidates = tokens if candidates is None else candidates & tokens
+            if not candidates:
+                return []
+        return [token for token in candidates if term in token]
+
+    def containing(self, text, collection):
+        """Ids of a collection's documents with a token containing each word of text (None if it has none)"""
+        # A superset of the documents whose indexed fields hold text as a substring
+        ids = None
+        for term in tokenize(text):
+            matched = {
+                key[1] for token in self._tokens_containing(term)
+                for key in self._postings[token] if key[0] == collection
+            }
+            ids = matched if ids is None else ids & matched
+            if not ids:
+                return set()
+        return ids
+
+    def _score_term(self, term, collections):
+        """Score documents matching one term, keeping the best token per document"""
+        total = len(self._documents) or 1
+        scores = {}
+        for token in self._expand(term):
+            postings = self._postings[token]
+            idf = math.log(1 + total / len(postings))
+            factor = idf if token == term else idf * PREFIX_PENALTY
+            for key, weight in postings.items():
+                if collections and key[0] not in collections:
+                    continue
+                score = weight * factor
+                if score > scores.get(key, 0.0):
+                    scores[key] = score
+        return scores
+
+    def search(self, query, collections=None, limit=None):
+        """Rank documents for a query; terms are AND-ed, 'OR' separates alternatives"""
+        results = {}
+        for group in parse_query(query):
+            group_scores = None
+            for term in group:
+                term_scores = self._score_term(term, collections)
+                if group_scores is None:
+                    group_scores = term_scores
+                else:
+                    group_scores = {
+                        key: score + term_scores[key]
+                        for key, score in group_scores.items() if key in term_scores
+                    }
+                if not group_scores:
+                    break
+            for key, score in (group_scores or {}).items():
+                if score > results.get(key, 0.0):
+                    results[key] = score
+        ranked = sorted(results.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit else ranked
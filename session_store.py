@@ -0,0 +1,225 @@
+# Thatoyaone: Authentication & Security - Server-Side Sessions
+
+import copy
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from sqlite_pool import ConnectionPool
+
+# Session backend selection (MINERALS_SESSION_BACKEND=memory|sqlite)
+SESSION_STORE_CONFIG = {
+    'backend': os.environ.get('MINERALS_SESSION_BACKEND', 'memory'),
+    'sqlite_path': os.environ.get('MINERALS_SESSION_PATH', 'sessions.db'),
+    'max_sessions': 10000
+}
+
+serializer = TaggedJSONSerializer()
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session data kept on the server; the cookie only carries its id"""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Move the session to a fresh id (call on login so a planted id is never authenticated)"""
+        self.previous_sid = self.previous_sid or self.sid
+        self.sid = ServerSessionInterface.new_sid()
+        self.new = True
+        self.modified = True
+
+
+class MemorySessionStore:
+    """In-process session store with LRU eviction and an idle timeout"""
+
+    def __init__(self, ttl_seconds, max_sessions=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._sessions[sid]
+                return None
+            self._sessions.move_to_end(sid)
+            # Copies, so a request that fails before saving leaves the stored session untouched
+            return copy.deepcopy(entry[1])
+
+    def set(self, sid, data):
+        with self._lock:
+            self._sessions[sid] = (time.time() + self.ttl_seconds, copy.deepcopy(dict(data)))
+            self._sessions.move_to_end(sid)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def purge_expired(self):
+        """Drop every expired session and return how many were removed"""
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (expires, _) in self._sessions.items() if expires < now]
+            for sid in expired:
+                del self._sessions[sid]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionStore:
+    """SQLite session store shared by every process using the same database file"""
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS sessions (
+            sid TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            expires REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires);
+    '''
+    SELECT_SQL = 'SELECT data FROM sessions WHERE sid = ? AND expires >= ?'
+    UPSERT_SQL = (
+        'INSERT INTO sessions (sid, data, expires) VALUES (?, ?, ?) '
+        'ON CONFLICT (sid) DO UPDATE SET data = excluded.data, expires = excluded.expires'
+    )
+    DELETE_SQL = 'DELETE FROM sessions WHERE sid = ?'
+    PURGE_SQL = 'DELETE FROM sessions WHERE expires < ?'
+
+    def __init__(self, path, ttl_seconds, pool_size=8):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._pool = ConnectionPool(path, pool_size, timeout=10, cached_statements=64)
+        with self._pool.connection() as connection:
+            # Persisted in the database file, so every later connection is in WAL mode too
+            connection.execute('PRAGMA journal_mode=WAL')
+            with connection:
+                connection.executescript(self.SCHEMA)
+
+    def get(self, sid):
+        with self._pool.connection() as connection:
+            row = connection.execute(self.SELECT_SQL, (sid, time.time())).fetchone()
+        return serializer.loads(row[0]) if row else None
+
+    def set(self, sid, data):
+        with self._pool.connection() as connection, connection:
+            connection.execute(
+                self.UPSERT_SQL, (sid, serializer.dumps(dict(data)), time.time() + self.ttl_seconds)
+            )
+
+    def delete(self, sid):
+        with self._pool.connection() as connection, connection:
+            connection.execute(self.DELETE_SQL, (sid,))
+
+    def purge_expired(self):
+        """Drop every expired session and return how many were removed"""
+        with self._pool.connection() as connection, connection:
+            return connection.execute(self.PURGE_SQL, (time.time(),)).rowcount
+
+    def close(self):
+        """Close the pooled connections"""
+        self._pool.close()
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface keeping session data in a server-side store"""
+
+    def __init__(self, store):
+        self.store = store
+
+    @staticmethod
+    def new_sid():
+        return secrets.token_urlsafe(32)
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.get(sid)
+            if data is not None:
+                return ServerSession(data, sid=sid)
+        # The id is only drawn once the session has something to store
+        return ServerSession(new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add('Cookie')
+        if session.previous_sid:
+            self.store.delete(session.previous_sid)
+        if not session:
+            if session.modified:
+                # Cleared (e.g. on logout): forget the server copy and the cookie
+                if session.sid is not None:
+                    self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+                response.vary.add('Cookie')
+            return
+        if session.sid is None:
+            session.sid = self.new_sid()
+        if session.modified:
+            self.store.set(session.sid, session)
+        # The id never changes, so the cookie is only sent when it is new (or refreshed)
+        if session.new or (session.permanent and app.config['SESSION_REFRESH_EACH_REQUEST']):
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+            response.vary.add('Cookie')
+
+
+def start_session_sweeper(store, interval_seconds):
+    """Evict expired sessions in bulk from a daemon thread every interval_seconds"""
+    def sweep():
+        while True:
+            time.sleep(interval_seconds)
+            store.purge_expired()
+
+    sweeper = threading.Thread(target=sweep, name='session-sweeper', daemon=True)
+    sweeper.start()
+    return sweeper
+
+
+def configure_sessions(app, ttl_seconds, backend=None, sqlite_path=None):
+    """Install a server-side session interface on a Flask app"""
+    backend = backend or SESSION_STORE_CONFIG['backend']
+    if backend == 'memory':
+        store = MemorySessionStore(ttl_seconds, SESSION_STORE_CONFIG['max_sessions'])
+    elif backend == 'sqlite':
+        store = SQLiteSessionStore(sqlite_path or SESSION_STORE_CONFIG['sqlite_path'], ttl_seconds)
+    else:
+        raise ValueError(f"Unknown session backend: {backend}")
+    SESSION_STORE_CONFIG['backend'] = backend
+    app.session_interface = ServerSessionInterface(store)
+    return store
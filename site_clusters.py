@@ -0,0 +1,112 @@
+# MRMODEPEKHALEMO: Data Management - Site Clustering
+
+from spatial_index import TILE_SIZE, longitude_ranges, world_pixel
+
+# Clusters are square cells of the Web Mercator pixel grid; 64 divides the 256 px
+# tile size, so every cell lies inside exactly one map tile
+CLUSTER_PIXELS = 64
+CELLS_PER_TILE = TILE_SIZE // CLUSTER_PIXELS
+MAX_CLUSTER_ZOOM = 16
+# Upper bound on grid cells in one view; coarser levels are used for views larger than this
+MAX_VIEW_CELLS = 4096
+
+
+class SiteClusters:
+    """Mining sites aggregated into grid clusters per zoom level; each level is built on first use"""
+
+    def __init__(self, sites):
+        self.sites = [
+            site for site in sites
+            if site.get('lat') is not None and site.get('lng') is not None
+        ]
+        # zoom -> {(column, row): [count, lat sum, lng sum, {mineral: count}, first site]}
+        self._levels = {}
+
+    @staticmethod
+    def _cell(lat, lng, zoom):
+        last = CELLS_PER_TILE * 2 ** zoom - 1
+        x, y = world_pixel(lat, lng, zoom)
+        return min(int(x // CLUSTER_PIXELS), last), min(int(y // CLUSTER_PIXELS), last)
+
+    def level(self, zoom):
+        """Clamp a zoom to the clustered range and get its cells"""
+        zoom = max(0, min(int(zoom), MAX_CLUSTER_ZOOM))
+        cells = self._levels.get(zoom)
+        if cells is None:
+            cells = {}
+            for site in self.sites:
+                lat, lng = site['lat'], site['lng']
+                key = self._cell(lat, lng, zoom)
+                cell = cells.get(key)
+                if cell is None:
+                    cell = cells[key] = [0, 0.0, 0.0, {}, site]
+                cell[0] += 1
+                cell[1] += lat
+                cell[2] += lng
+                minerals = cell[3]
+                mineral = site.get('mineral') or 'Unknown'
+                minerals[mineral] = minerals.get(mineral, 0) + 1
+            self._levels[zoom] = cells
+        return zoom, cells
+
+    def _view_cells(self, zoom, bbox):
+        """Grid columns (per longitude range) and rows covered by a bbox"""
+        west, south, east, north = bbox or (-180.0, -90.0, 180.0, 90.0)
+        ranges = longitude_ranges(west, east) or [(-180.0, 180.0)]
+        columns = [
+            range(self._cell(0, low, zoom)[0], self._cell(0, high, zoom)[0] + 1) for low, high in ranges
+        ]
+        rows = range(self._cell(north, 0, zoom)[1], self._cell(south, 0, zoom)[1] + 1)
+        return columns, rows
+
+    @staticmethod
+    def _select(cells, columns, rows):
+        if sum(len(span) for span in columns) * len(rows) > len(cells):
+            # Fewer occupied cells than cells in view: filter the occupied ones instead
+            return [
+                cell for (column, row), cell in cells.items()
+                if row in rows and any(column in span for span in columns)
+            ]
+        return [
+            cells[(column, row)] for span in columns for column in span for row in rows
+            if (column, row) in cells
+        ]
+
+    @staticmethod
+    def _describe(selected):
+        results = []
+        for count, lat_sum, lng_sum, minerals, site in selected:
+            # Most common mineral; ties go to the alphabetically first
+            dominant = min(minerals.items(), key=lambda item: (-item[1], item[0]))[0]
+            cluster = {
+                'lat': round(lat_sum / count, 6),
+                'lng': round(lng_sum / count, 6),
+                'count': count,
+                'dominant_mineral': dominant
+            }
+            if count == 1:
+                cluster['site'] = site
+            results.append(cluster)
+        return results
+
+    def clusters(self, zoom, bbox=None):
+        """Clusters with their centroid, site count and dominant mineral; single sites carry the site"""
+        zoom = max(0, min(int(zoom), MAX_CLUSTER_ZOOM))
+        # Keep the payload bounded when a large box is requested at a fine zoom
+        while True:
+            columns, rows = self._view_cells(zoom, bbox)
+            if zoom == 0 or sum(len(span) for span in columns) * len(rows) <= MAX_VIEW_CELLS:
+                break
+            zoom -= 1
+        zoom, cells = self.level(zoom)
+        selected = self._select(cells, columns, rows) if bbox else cells.values()
+        return zoom, self._describe(selected)
+
+    def tile_clusters(self, zoom, x, y):
+        """Clusters inside one slippy-map tile; every cell belongs to exactly one tile"""
+        if zoom > MAX_CLUSTER_ZOOM:
+            raise ValueError(f"Sites are not clustered past zoom {MAX_CLUSTER_ZOOM}")
+        zoom, cells = self.level(zoom)
+        columns = [range(x * CELLS_PER_TILE, (x + 1) * CELLS_PER_TILE)]
+        rows = range(y * CELLS_PER_TILE, (y + 1) * CELLS_PER_TILE)
+        return self._describe(self._select(cells, columns, rows))
@@ -0,0 +1,137 @@
+# MRMODEPEKHALEMO: Data Management - Columnar Site Table
+
+import numpy as np
+
+CATEGORICAL_COLUMNS = ('mineral', 'country', 'status', 'operator')
+# Columns read straight from the record; the others come from the parsed numeric view
+RECORD_COLUMNS = ('lat', 'lng', 'year_established')
+PARSED_COLUMNS = ('production', 'reserves', 'employment')
+NUMERIC_COLUMNS = RECORD_COLUMNS + PARSED_COLUMNS
+
+RANGE_OPERATORS = {
+    'gte': np.greater_equal,
+    'gt': np.greater,
+    'lte': np.less_equal,
+    'lt': np.less
+}
+
+AGGREGATES = ('count', 'sum', 'mean', 'min', 'max')
+
+
+class SiteTable:
+    """Mining sites as integer-coded categorical and float64 numeric NumPy columns"""
+
+    def __init__(self, ids, labels, codes, numeric):
+        self.ids = ids
+        self.labels = labels
+        self.codes = codes
+        self.numeric = numeric
+        self._lookup = {
+            column: {label.lower(): code for code, label in enumerate(values)}
+            for column, values in labels.items()
+        }
+
+    @classmethod
+    def from_records(cls, sites, numeric_view):
+        """Build the columns from site records and a (site_id, field) -> Quantity lookup"""
+        count = len(sites)
+        ids = np.fromiter((site['id'] for site in sites), dtype=np.int64, count=count)
+        labels = {}
+        codes = {}
+        for column in CATEGORICAL_COLUMNS:
+            values = []
+            lookup = {}
+            column_codes = np.empty(count, dtype=np.int32)
+            for row, site in enumerate(sites):
+                label = site.get(column) or ''
+                code = lookup.get(label)
+                if code is None:
+                    code = lookup[label] = len(values)
+                    values.append(label)
+                column_codes[row] = code
+            labels[column] = values
+            codes[column] = column_codes
+        numeric = {}
+        for column in RECORD_COLUMNS:
+            numeric[column] = np.fromiter(
+                (np.nan if site.get(column) is None else site.get(column) for site in sites),
+                dtype=np.float64, count=count
+            )
+        for column in PARSED_COLUMNS:
+            quantities = (numeric_view(site['id'], column) for site in sites)
+            numeric[column] = np.fromiter(
+                (np.nan if quantity is None else quantity.value for quantity in quantities),
+                dtype=np.float64, count=count
+            )
+        return cls(ids, labels, codes, numeric)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def mask(self, filters):
+        """Boolean row mask for {column: value} equality and {column_op: number} range filters"""
+        mask = np.ones(len(self), dtype=bool)
+        for key, value in filters.items():
+            if key in self.codes:
+                values = value if isinstance(value, (list, tuple)) else [value]
+                wanted = [self._lookup[key].get(str(item).lower(), -1) for item in values]
+                mask &= np.isin(self.codes[key], wanted)
+                continue
+            column, _, operator = key.rpartition('_')
+            if column not in self.numeric or operator not in RANGE_OPERATORS:
+                raise ValueError(f"Unknown filter: {key}")
+            # NaN compares false, so rows with no parsed value drop out of range filters
+            mask &= RANGE_OPERATORS[operator](self.numeric[column], float(value))
+        return mask
+
+    def select(self, filters=None, sort=None, descending=False):
+        """Row positions matching the filters, optionally ordered by a column"""
+        rows = np.flatnonzero(self.mask(filters or {}))
+        if sort:
+            if sort in self.numeric:
+                keys = self.numeric[sort][rows]
+            elif sort in self.codes:
+                # Rank codes by label so categorical sorts are alphabetical
+                order = np.argsort(np.array([label.lower() for label in self.labels[sort]], dtype=object))
+                ranks = np.empty(len(order), dtype=np.int64)
+                ranks[order] = np.arange(len(order))
+                keys = ranks[self.codes[sort][rows]]
+            else:
+                raise ValueError(f"Unknown sort column: {sort}")
+            order = np.argsort(keys, kind='stable')
+            if descending:
+                # Reverse, keeping rows with missing values last
+                missing = np.isnan(keys[order]) if keys.dtype.kind == 'f' else np.zeros(len(order), bool)
+                order = np.concatenate([order[~missing][::-1], order[missing]])
+            rows = rows[order]
+        return rows
+
+    def group_by(self, by, column=None, agg='count', filters=None):
+        """Aggregate a numeric column per category label, e.g. total production per mineral"""
+        if by not in self.codes:
+            raise ValueError(f"Unknown group column: {by}")
+        if agg not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate: {agg}")
+        if agg != 'count' and column not in self.numeric:
+            raise ValueError(f"Unknown numeric column: {column}")
+        mask = self.mask(filters or {})
+        if agg != 'count':
+            mask &= ~np.isnan(self.numeric[column])
+        codes = self.codes[by][mask]
+        groups = len(self.labels[by])
+        counts = np.bincount(codes, minlength=groups)
+        if agg == 'count':
+            values = counts.astype(np.float64)
+        else:
+            data = self.numeric[column][mask]
+            if agg in ('sum', 'mean'):
+                values = np.bincount(codes, weights=data, minlength=groups)
+                if agg == 'mean':
+                    values = np.divide(values, counts, out=np.full(groups, np.nan), where=counts > 0)
+            else:
+                values = np.full(groups, np.inf if agg == 'min' else -np.inf)
+                (np.minimum if agg == 'min' else np.maximum).at(values, codes, data)
+        return {
+            self.labels[by][code]: float(values[code])
+            for code in np.flatnonzero(counts)
+        }
@@ -0,0 +1,248 @@
+# MRMODEPEKHALEMO: Data Management - Binary Snapshots
+
+import bisect
+import json
+import math
+import mmap
+import struct
+import sys
+from collections.abc import Sequence
+
+# File layout (little-endian, every section 8-byte aligned):
+#   MAGIC | uint64 header length | JSON header
+#   string table: uint64 offsets[count + 1] | UTF-8 blob
+#   per collection, one fixed-width array per column (rows sorted by id)
+MAGIC = b'ACMSNAP1'
+INT_NULL = -2 ** 63
+STRING_NULL = 0xFFFFFFFF
+LIST_SEPARATOR = '\x1f'
+
+# Column kind -> memoryview format and item size
+COLUMN_FORMATS = {
+    'int': ('q', 8),
+    'float': ('d', 8),
+    'str': ('I', 4),
+    'list': ('I', 4),
+    'json': ('I', 4)
+}
+
+
+def _column_kind(values):
+    """Pick the narrowest column kind that can hold every value"""
+    present = [value for value in values if value is not None]
+    if present and all(isinstance(value, int) and not isinstance(value, bool) for value in present):
+        return 'int'
+    if present and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        return 'float'
+    if all(isinstance(value, str) for value in present):
+        return 'str'
+    if all(isinstance(value, (list, tuple)) and all(isinstance(item, str) for item in value) for value in present):
+        return 'list'
+    return 'json'
+
+
+def _pad(buffer):
+    buffer.extend(b'\0' * (-len(buffer) % 8))
+
+
+def write_snapshot(path, manager):
+    """Write the collections of a DataManager to a snapshot file"""
+    strings = {}
+
+    def string_id(text):
+        if text not in strings:
+            strings[text] = len(strings)
+        return strings[text]
+
+    def encode(kind, value):
+        if kind == 'int':
+            return INT_NULL if value is None else value
+        if kind == 'float':
+            return math.nan if value is None else float(value)
+        if value is None:
+            return STRING_NULL
+        if kind == 'list':
+            return string_id(LIST_SEPARATOR.join(value))
+        if kind == 'json':
+            return string_id(json.dumps(value))
+        return string_id(value)
+
+    encoded = {}
+    for name in manager.COLLECTIONS:
+        records = sorted(manager.collections[name], key=lambda record: record['id'])
+        keys = list(dict.fromkeys(key for record in records for key in record.keys()))
+        columns = []
+        for key in keys:
+            values = [record.get(key) for record in records]
+            kind = _column_kind(values)
+            fmt, _ = COLUMN_FORMATS[kind]
+            data = struct.pack(f'<{len(values)}{fmt}', *(encode(kind, value) for value in values))
+            columns.append((key, kind, data))
+        encoded[name] = (len(records), columns)
+
+    blob = bytearray()
+    offsets = [0]
+    for text in strings:
+        blob.extend(text.encode('utf-8'))
+        offsets.append(len(blob))
+    _pad(blob)
+
+    def build_header(header_length):
+        position = len(MAGIC) + 8 + header_length
+        header = {'strings': {
+            'count': len(strings),
+            'offsets': position,
+            'blob': position + 8 * len(offsets),
+            'blob_length': len(blob)
+        }, 'collections': {}}
+        position = header['strings']['blob'] + len(blob)
+        for name, (rows, columns) in encoded.items():
+            layout = []
+            for key, kind, data in columns:
+                layout.append([key, kind, position])
+                position += len(data) + (-len(data) % 8)
+            header['collections'][name] = {'rows': rows, 'columns': layout}
+        header_bytes = bytearray(json.dumps(header).encode('utf-8'))
+        _pad(header_bytes)
+        return header_bytes
+
+    # Section offsets depend on the header length, so repeat until it is stable
+    header_bytes = build_header(0)
+    rebuilt = build_header(len(header_bytes))
+    while len(rebuilt) != len(header_bytes):
+        header_bytes = rebuilt
+        rebuilt = build_header(len(header_bytes))
+    header_bytes = rebuilt
+
+    with open(path, 'wb') as handle:
+        handle.write(MAGIC)
+        handle.write(struct.pack('<Q', len(header_bytes)))
+        handle.write(header_bytes)
+        handle.write(struct.pack(f'<{len(offsets)}Q', *offsets))
+        handle.write(blob)
+        for rows, columns in encoded.values():
+            for key, kind, data in columns:
+                padded = bytearray(data)
+                _pad(padded)
+                handle.write(padded)
+
+
+class Snapshot:
+    """A memory-mapped snapshot file shared through the OS page cache"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        if bytes(self._view[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a minerals snapshot")
+        header_length = struct.unpack_from('<Q', self._mmap, len(MAGIC))[0]
+        start = len(MAGIC) + 8
+        self.header = json.loads(bytes(self._view[start:start + header_length]).rstrip(b'\0'))
+        table = self.header['strings']
+        self._offsets = self._view[table['offsets']:table['blob']].cast('Q')
+        self._blob = self._view[table['blob']:table['blob'] + table['blob_length']]
+        self._strings = {}
+        self.collections = {
+            name: SnapshotCollection(self, name, layout)
+            for name, layout in self.header['collections'].items()
+        }
+
+    def string(self, string_id):
+        """Decode an entry of the string table"""
+        text = self._strings.get(string_id)
+        if text is None:
+            start, end = self._offsets[string_id], self._offsets[string_id + 1]
+            text = sys.intern(bytes(self._blob[start:end]).decode('utf-8'))
+            self._strings[string_id] = text
+        return text
+
+    def column(self, offset, kind, rows):
+        """Get a typed view of a fixed-width column"""
+        fmt, size = COLUMN_FORMATS[kind]
+        return self._view[offset:offset + rows * size].cast(fmt)
+
+    def close(self):
+        """Release the mapping"""
+        for collection in self.collections.values():
+            collection.release()
+        self._offsets.release()
+        self._blob.release()
+        self._view.release()
+        self._mmap.close()
+
+
+class SnapshotCollection(Sequence):
+    """Read-only record sequence decoded row by row from a snapshot"""
+
+    def __init__(self, snapshot, name, layout):
+        self.snapshot = snapshot
+        self.name = name
+        self.rows = layout['rows']
+        self.columns = [
+            (key, kind, snapshot.column(offset, kind, self.rows))
+            for key, kind, offset in layout['columns']
+        ]
+        self._ids = self.column('id')
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.rows))]
+        if index < 0:
+            index += self.rows
+        if not 0 <= index < self.rows:
+            raise IndexError(index)
+        return self._decode(index)
+
+    def _decode(self, index):
+        record = {}
+        string = self.snapshot.string
+        for key, kind, column in self.columns:
+            value = column[index]
+            if kind == 'int':
+                value = None if value == INT_NULL else value
+            elif kind == 'float':
+                value = None if math.isnan(value) else value
+            elif value == STRING_NULL:
+                value = None
+            elif kind == 'str':
+                value = string(value)
+            elif kind == 'list':
+                text = string(value)
+                value = text.split(LIST_SEPARATOR) if text else []
+            else:
+                value = json.loads(string(value))
+            record[key] = value
+        return record
+
+    def column(self, key):
+        """Get the raw column view for a key (None if the key is absent)"""
+        for name, _, column in self.columns:
+            if name == key:
+                return column
+        return None
+
+    def get_by_id(self, record_id):
+        """Find a record by id with a binary search over the sorted id column"""
+        if self._ids is None:
+            return None
+        index = bisect.bisect_left(self._ids, record_id)
+        if index < self.rows and self._ids[index] == record_id:
+            return self._decode(index)
+        return None
+
+    def release(self):
+        """Release the column views so the mapping can be closed"""
+        for _, _, column in self.columns:
+            column.release()
+
+
+if __name__ == '__main__':
+    from data_manager import data_manager
+    target = sys.argv[1] if len(sys.argv) > 1 else 'minerals.snapshot'
+    write_snapshot(target, data_manager)
+    print(f"Snapshot written to {target}")
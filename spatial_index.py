@@ -0,0 +1,282 @@
+# MRMODEPEKHALEMO: Data Management - Spatial Index
+
+import heapq
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def parse_bbox(text):
+    """Parse a 'west,south,east,north' bounding box (Leaflet's toBBoxString order)"""
+    try:
+        west, south, east, north = (float(part) for part in text.split(','))
+    except (AttributeError, ValueError):
+        raise ValueError("bbox must be 'west,south,east,north'")
+    if not (-90 <= south <= north <= 90):
+        raise ValueError("bbox latitudes must satisfy -90 <= south <= north <= 90")
+    return west, south, east, north
+
+
+def longitude_ranges(west, east):
+    """Split a bbox's longitude span into ranges inside [-180, 180], or None for the whole world"""
+    if east - west >= 360:
+        return None
+    # Leaflet reports longitudes past +/-180 once the map is panned across the antimeridian
+    west = (west + 180) % 360 - 180
+    east = (east + 180) % 360 - 180
+    if west <= east:
+        return [(west, east)]
+    # The box crosses the antimeridian
+    return [(west, 180.0), (-180.0, east)]
+
+
+def snap_bbox(bbox, cells=4):
+    """Widen a bbox to a grid whose step (a power of two in degrees) is about a quarter of its span"""
+    west, south, east, north = bbox
+    span = max((east - west) % 360 or 360, north - south, 1e-6)
+    step = 2.0 ** math.ceil(math.log2(span / cells))
+    return (
+        math.floor(west / step) * step,
+        max(-90.0, math.floor(south / step) * step),
+        math.ceil(east / step) * step,
+        min(90.0, math.ceil(north / step) * step)
+    )
+
+
+# Web Mercator slippy-map tiles
+TILE_SIZE = 256
+MAX_LATITUDE = 85.0511287798
+
+
+def world_pixel(lat, lng, zoom):
+    """Web Mercator pixel coordinates of a point at a zoom level (y grows southwards)"""
+    scale = TILE_SIZE * 2 ** zoom
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    sin_lat = math.sin(math.radians(lat))
+    x = (lng + 180) / 360 * scale
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+
+def tile_of(lat, lng, zoom):
+    """(x, y) of the tile holding a point; points on a shared edge belong to the east/south tile"""
+    last = 2 ** zoom - 1
+    x, y = world_pixel(lat, lng, zoom)
+    return min(int(x // TILE_SIZE), last), min(int(y // TILE_SIZE), last)
+
+
+def tile_bbox(zoom, x, y):
+    """(west, south, east, north) of a Web Mercator slippy-map tile"""
+    tiles = 2 ** zoom
+    if not (0 <= x < tiles and 0 <= y < tiles):
+        raise ValueError(f"Tile {zoom}/{x}/{y} is out of range")
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / tiles))))
+
+    return x / tiles * 360 - 180, latitude(y + 1), (x + 1) / tiles * 360 - 180, latitude(y)
+
+
+class GridIndex:
+    """Uniform lat/lng grid over point ids for bounding-box and nearest-neighbour queries"""
+
+    # Occupied cells are also grouped into nested square blocks of these many cells a side
+    BLOCK_SPANS = (64, 16, 4)
+
+    def __init__(self, cell_size=0.5):
+        self.cell_size = cell_size
+        self._columns = int(math.ceil(360 / cell_size))
+        self._cells = {}
+        self._blocks = {span: {} for span in self.BLOCK_SPANS}
+        self._points = {}
+
+    def __len__(self):
+        return len(self._points)
+
+    def _cell(self, lat, lng):
+        return (int(math.floor(lat / self.cell_size)),
+                int(math.floor((lng + 180) / self.cell_size)) % self._columns)
+
+    def _link(self, cell):
+        child = cell
+        for span in reversed(self.BLOCK_SPANS):
+            children = self._blocks[span].setdefault((cell[0] // span, cell[1] // span), set())
+            linked = bool(children)
+            children.add(child)
+            if linked:
+                break
+            child = (cell[0] // span, cell[1] // span)
+
+    def _unlink(self, cell):
+        child = cell
+        for span in reversed(self.BLOCK_SPANS):
+            key = (cell[0] // span, cell[1] // span)
+            children = self._blocks[span][key]
+            children.discard(child)
+            if children:
+                break
+            del self._blocks[span][key]
+            child = key
+
+    def insert(self, point_id, lat, lng):
+        """Add or move a point"""
+        if point_id in self._points:
+            self.remove(point_id)
+        cell = self._cell(lat, lng)
+        if cell not in self._cells:
+            self._cells[cell] = {}
+            self._link(cell)
+        self._cells[cell][point_id] = (lat, lng)
+        self._points[point_id] = cell
+
+    def remove(self, point_id):
+        """Drop a point"""
+        cell = self._points.pop(point_id, None)
+        if cell is None:
+            return
+        points = self._cells[cell]
+        del points[point_id]
+        if not points:
+            del self._cells[cell]
+            self._unlink(cell)
+
+    def clear(self):
+        self._cells.clear()
+        for blocks in self._blocks.values():
+            blocks.clear()
+        self._points.clear()
+
+    def query_bbox(self, west, south, east, north):
+        """Get the ids of points inside a bounding box (west > east crosses the antimeridian)"""
+        ranges = longitude_ranges(west, east) or [(-180.0, 180.0)]
+        return [
+            point_id for low, high in ranges for point_id in self._query_range(low, south, high, north)
+        ]
+
+    def _query_range(self, west, south, east, north):
+        """Ids of points in a box whose longitudes lie within [-180, 180] with west <= east"""
+        row_min, col_min = self._cell(south, west)
+        row_max, col_max = self._cell(north, min(east, 180 - 1e-9))
+        rows = range(row_min, row_max + 1)
+        cols = range(col_min, col_max + 1)
+        if len(rows) * len(cols) > len(self._cells):
+            cells = [points for (row, col), points in self._cells.items() if row in rows and col in cols]
+        else:
+            cells = [self._cells[(row, col)] for row in rows for col in cols if (row, col) in self._cells]
+        return [
+            point_id
+            for points in cells
+            for point_id, (lat, lng) in points.items()
+            if south <= lat <= north and west <= lng <= east
+        ]
+
+    def _ring(self, row0, col0, ring):
+        if ring == 0:
+            return [(row0, col0)]
+        cells = [(row0 - ring, col) for col in range(col0 - ring, col0 + ring + 1)]
+        cells += [(row0 + ring, col) for col in range(col0 - ring, col0 + ring + 1)]
+        cells += [(row, col0 - ring) for row in range(row0 - ring + 1, row0 + ring)]
+        cells += [(row, col0 + ring) for row in range(row0 - ring + 1, row0 + ring)]
+        return cells
+
+    def _ring_bound(self, lat, lng, row0, col0, ring):
+        """Lower bound in km on the distance to any point outside the searched block"""
+        size = self.cell_size
+        south_edge = (row0 - ring) * size
+        north_edge = (row0 + ring + 1) * size
+        lat_gaps = []
+        if south_edge > -90:
+            lat_gaps.append(lat - south_edge)
+        if north_edge < 90:
+            lat_gaps.append(north_edge - lat)
+        bounds = [EARTH_RADIUS_KM * math.radians(gap) for gap in lat_gaps]
+        if (2 * ring + 1) * size < 360:
+            west_edge = (col0 - ring) * size - 180
+            east_edge = (col0 + ring + 1) * size - 180
+            gap = min(lng - west_edge, east_edge - lng)
+            # Distance to the nearest meridian at least `gap` degrees away
+            reach = math.cos(math.radians(lat)) * math.sin(math.radians(min(gap, 90)))
+            bounds.append(EARTH_RADIUS_KM * math.asin(min(1.0, max(0.0, reach))))
+        return min(bounds) if bounds else math.inf
+
+    def _box_bound(self, lat, lng, row, col, span):
+        """Distance in km from a point to the nearest spot of a span x span block of cells"""
+        size = self.cell_size
+        south = max(-90.0, row * size)
+        north = min(90.0, (row + span) * size)
+        west = col * size - 180
+        width = span * size
+        if (lng - west) % 360 <= width:
+            return EARTH_RADIUS_KM * math.radians(max(south - lat, lat - north, 0.0))
+        # Otherwise the nearest spot is on the west or east edge, at the latitude where
+        # that meridian comes closest to the point, kept inside the block
+        phi = math.radians(lat)
+        bounds = []
+        for edge in (west, west + width):
+            crossing = math.degrees(math.atan2(math.sin(phi), math.cos(phi) * math.cos(math.radians(edge - lng))))
+            bounds.append(haversine_km(lat, lng, max(south, min(north, crossing)), edge))
+        return min(bounds)
+
+    def nearest(self, lat, lng, k=1):
+        """Get up to k (distance_km, id) pairs closest to a point, nearest first"""
+        if k <= 0 or not self._points:
+            return []
+        row0, col0 = self._cell(lat, lng)
+        best = []
+        visited = set()
+
+        def consider(cell):
+            for point_id, (point_lat, point_lng) in self._cells[cell].items():
+                entry = (-haversine_km(lat, lng, point_lat, point_lng), point_id)
+                if len(best) < k:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+
+        def result():
+            return sorted((-distance, point_id) for distance, point_id in best)
+
+        # Rings of cells around the point settle queries from inside the area with sites
+        for ring in range(self.BLOCK_SPANS[-1] + 1):
+            for row, col in self._ring(row0, col0, ring):
+                cell = (row, col % self._columns)
+                if cell in visited:
+                    continue
+                visited.add(cell)
+                if cell in self._cells:
+                    consider(cell)
+            bound = self._ring_bound(lat, lng, row0, col0, ring)
+            if bound == math.inf or (len(best) == k and -best[0][0] <= bound):
+                return result()
+
+        # Further out, go best-first down the occupied blocks to their cells, nearest possible
+        # spot first, so the empty parts of the world are never walked
+        spans = self.BLOCK_SPANS + (1,)
+        top = spans[0]
+        queue = [
+            (self._box_bound(lat, lng, row * top, col * top, top), 0, (row, col))
+            for row, col in self._blocks[top]
+        ]
+        heapq.heapify(queue)
+        while queue:
+            bound, level, key = heapq.heappop(queue)
+            if len(best) == k and -best[0][0] <= bound:
+                break
+            if level == len(self.BLOCK_SPANS):
+                consider(key)
+                continue
+            span = spans[level + 1]
+            for row, col in self._blocks[spans[level]][key]:
+                if span > 1 or (row, col) not in visited:
+                    bound = self._box_bound(lat, lng, row * span, col * span, span)
+                    heapq.heappush(queue, (bound, level + 1, (row, col)))
+        return result()
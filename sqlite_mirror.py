@@ -0,0 +1,217 @@
+# MRMODEPEKHALEMO: Data Management - SQLite Mirror
+
+import json
+import threading
+import time
+import uuid
+
+from records import as_dict
+from sqlite_pool import ConnectionPool
+
+
+class SQLiteMirror:
+    """SQLite copy of a DataManager's collections, serving its plain lookups from indexed tables"""
+
+    COLLECTIONS = ('minerals', 'countries', 'mining_sites', 'investment_opportunities')
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS minerals (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL COLLATE NOCASE,
+            description TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_minerals_name ON minerals (name);
+        CREATE TABLE IF NOT EXISTS countries (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL COLLATE NOCASE,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_countries_name ON countries (name);
+        CREATE TABLE IF NOT EXISTS mining_sites (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL COLLATE NOCASE,
+            mineral TEXT COLLATE NOCASE,
+            country TEXT COLLATE NOCASE,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_mining_sites_mineral_country ON mining_sites (mineral, country);
+        CREATE INDEX IF NOT EXISTS idx_mining_sites_country ON mining_sites (country);
+        CREATE TABLE IF NOT EXISTS investment_opportunities (
+            id INTEGER PRIMARY KEY,
+            name TEXT COLLATE NOCASE,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS raw_rows (
+            table_name TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_raw_rows_table ON raw_rows (table_name);
+    '''
+
+    # Statements are parameterized so each connection's statement cache
+    # compiles them once and reuses the prepared form
+    INSERT_SQL = {
+        'minerals': 'INSERT INTO minerals (id, name, description, data) VALUES (?, ?, ?, ?)',
+        'countries': 'INSERT INTO countries (id, name, data) VALUES (?, ?, ?)',
+        'mining_sites': 'INSERT INTO mining_sites (id, name, mineral, country, data) VALUES (?, ?, ?, ?, ?)',
+        'investment_opportunities': 'INSERT INTO investment_opportunities (id, name, data) VALUES (?, ?, ?)'
+    }
+    SELECT_ALL_SQL = {name: f'SELECT data FROM {name} ORDER BY id' for name in COLLECTIONS}
+    SELECT_BY_ID_SQL = {name: f'SELECT data FROM {name} WHERE id = ?' for name in COLLECTIONS}
+    SELECT_BY_NAME_SQL = {name: f'SELECT data FROM {name} WHERE name = ?' for name in COLLECTIONS}
+    COUNT_SQL = {name: f'SELECT COUNT(*) FROM {name}' for name in COLLECTIONS}
+    SEARCH_MINERALS_SQL = (
+        "SELECT data FROM minerals WHERE name LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\' ORDER BY id"
+    )
+    SITES_BY_MINERAL_COUNTRY_SQL = 'SELECT data FROM mining_sites WHERE mineral = ? AND country = ? ORDER BY id'
+    SITES_BY_MINERAL_SQL = 'SELECT data FROM mining_sites WHERE mineral = ? ORDER BY id'
+    SITES_BY_COUNTRY_SQL = 'SELECT data FROM mining_sites WHERE country = ? ORDER BY id'
+
+    def __init__(self, path=':memory:', pool_size=8):
+        self.in_memory = path == ':memory:'
+        if self.in_memory:
+            # A named shared-cache database lets every pooled connection see the same data
+            self.uri = f'file:minerals-{uuid.uuid4().hex}?mode=memory&cache=shared'
+        else:
+            self.uri = f'file:{path}'
+        self._pool = ConnectionPool(self.uri, pool_size, uri=True, cached_statements=256)
+        self._lock = threading.Lock()
+        self.versions = {name: 0 for name in self.COLLECTIONS}
+        self.modified = {name: time.time() for name in self.COLLECTIONS}
+        # Keeps a shared in-memory database alive while the store exists
+        self._anchor = self._pool.connect()
+        if not self.in_memory:
+            # Persisted in the database file, so every later connection is in WAL mode too
+            self._anchor.execute('PRAGMA journal_mode=WAL')
+        self._anchor.executescript(self.SCHEMA)
+
+    def connection(self):
+        """Borrow a connection from the pool (opening one if every pooled connection is busy)"""
+        return self._pool.connection()
+
+    def _fetch_all(self, sql, params=()):
+        with self.connection() as connection:
+            return [json.loads(row[0]) for row in connection.execute(sql, params)]
+
+    def _fetch_one(self, sql, params=()):
+        with self.connection() as connection:
+            row = connection.execute(sql, params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @staticmethod
+    def _row_params(collection, record):
+        data = json.dumps(as_dict(record))
+        if collection == 'minerals':
+            return (record['id'], record['name'], record.get('description'), data)
+        if collection == 'mining_sites':
+            return (record['id'], record['name'], record.get('mineral'), record.get('country'), data)
+        return (record['id'], record.get('name') or record.get('title'), data)
+
+    def _insert(self, connection, table, rows):
+        if table in self.COLLECTIONS:
+            connection.executemany(self.INSERT_SQL[table], (self._row_params(table, row) for row in rows))
+        else:
+            connection.executemany(
+                'INSERT INTO raw_rows (table_name, data) VALUES (?, ?)',
+                ((table, json.dumps(as_dict(row))) for row in rows)
+            )
+
+    def _bump(self, table):
+        with self._lock:
+            self.versions[table] = self.versions.get(table, 0) + 1
+            self.modified[table] = time.time()
+
+    def bulk_insert(self, table, rows):
+        """Insert a batch of rows into a collection or raw table in one transaction"""
+        with self.connection() as connection, connection:
+            self._insert(connection, table, rows)
+        self._bump(table)
+
+    def add_record(self, collection, record):
+        """Insert a single record into a collection"""
+        self.bulk_insert(collection, [record])
+
+    def load_from(self, manager):
+        """Replace every collection and raw table with the DataManager's (a file store keeps last run's rows)"""
+        with self.connection() as connection, connection:
+            for collection in self.COLLECTIONS:
+                connection.execute(f'DELETE FROM {collection}')
+                self._insert(connection, collection, manager.collections[collection])
+            connection.execute('DELETE FROM raw_rows')
+            for table, rows in manager.tables.items():
+                self._insert(connection, table, rows)
+        for table in self.COLLECTIONS + tuple(manager.tables):
+            self._bump(table)
+        return self
+
+    def data_version(self, collection=None):
+        """Get the version counter of a collection (or the sum over all)"""
+        if collection:
+            return self.versions.get(collection, 0)
+        return sum(self.versions.values())
+
+    def get_table(self, table):
+        """Get the rows of a raw table"""
+        return self._fetch_all('SELECT data FROM raw_rows WHERE table_name = ? ORDER BY rowid', (table,))
+
+    def count(self, collection):
+        """Count the records in a collection"""
+        with self.connection() as connection:
+            return connection.execute(self.COUNT_SQL[collection]).fetchone()[0]
+
+    @property
+    def minerals(self):
+        return self._fetch_all(self.SELECT_ALL_SQL['minerals'])
+
+    @property
+    def countries(self):
+        return self._fetch_all(self.SELECT_ALL_SQL['countries'])
+
+    @property
+    def mining_sites(self):
+        return self._fetch_all(self.SELECT_ALL_SQL['mining_sites'])
+
+    @property
+    def investment_opportunities(self):
+        return self._fetch_all(self.SELECT_ALL_SQL['investment_opportunities'])
+
+    def get_mineral_by_id(self, mineral_id):
+        """Get a mineral by its id"""
+        return self._fetch_one(self.SELECT_BY_ID_SQL['minerals'], (mineral_id,))
+
+    def get_mineral_by_name(self, name):
+        """Get a mineral by its name (case-insensitive)"""
+        return self._fetch_one(self.SELECT_BY_NAME_SQL['minerals'], (name,))
+
+    def get_country_by_id(self, country_id):
+        """Get a country by its id"""
+        return self._fetch_one(self.SELECT_BY_ID_SQL['countries'], (country_id,))
+
+    def get_country_by_name(self, name):
+        """Get a country by its name (case-insensitive)"""
+        return self._fetch_one(self.SELECT_BY_NAME_SQL['countries'], (name,))
+
+    def get_mining_site_by_id(self, site_id):
+        """Get a mining site by its id"""
+        return self._fetch_one(self.SELECT_BY_ID_SQL['mining_sites'], (site_id,))
+
+    def get_production_trends(self, mineral=None, country=None):
+        """Get mining sites filtered by mineral and/or country"""
+        if mineral is None and country is None:
+            return self.mining_sites
+        if mineral is None:
+            return self._fetch_all(self.SITES_BY_COUNTRY_SQL, (country,))
+        if country is None:
+            return self._fetch_all(self.SITES_BY_MINERAL_SQL, (mineral,))
+        return self._fetch_all(self.SITES_BY_MINERAL_COUNTRY_SQL, (mineral, country))
+
+    def search_minerals(self, query):
+        """Search minerals by name or description"""
+        pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        return self._fetch_all(self.SEARCH_MINERALS_SQL, (pattern, pattern))
+
+    def close(self):
+        """Close the pooled connections and the anchor connection"""
+        self._pool.close()
+        self._anchor.close()
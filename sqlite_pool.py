@@ -0,0 +1,43 @@
+# MRMODEPEKHALEMO: Data Management - SQLite Connection Pool
+
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """LIFO pool of SQLite connections shared by every request thread"""
+
+    def __init__(self, database, size=8, **options):
+        self.database = database
+        # Pooled connections move between threads, but only one thread uses a connection at a time
+        self.options = dict(options, check_same_thread=False)
+        # Idle connections are reused across requests, keeping their statement caches warm
+        self._pool = queue.LifoQueue(maxsize=size)
+
+    def connect(self):
+        """Open a new connection outside the pool"""
+        return sqlite3.connect(self.database, **self.options)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection from the pool (opening one if every pooled connection is busy)"""
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = self.connect()
+        try:
+            yield connection
+        finally:
+            try:
+                self._pool.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+
+    def close(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
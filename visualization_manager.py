@@ -1,6 +1,13 @@
 
 # Khutsiso Teffo: Visualization & Frontend Templates
 
+from datetime import datetime
+
+from flask import current_app
+from markupsafe import Markup
+
+from auth_manager import LOGIN_HTML
+
 # HTML Templates for the application
 
 INDEX_HTML = '''
@@ -806,7 +813,7 @@ DASHBOARD_HTML = '''
             </div>
             <div class="quick-stat">
                 <small>Last Login</small>
-                <div>{{ session.get('login_time', 'First visit') }}</div>
+                <div>{{ session.login_time|epoch if session.login_time else 'First visit' }}</div>
             </div>
             <div class="quick-stat">
                 <small>Your Role</small>
@@ -843,31 +850,11 @@ DASHBOARD_HTML = '''
             
             <h3>Price Trends</h3>
             <div class="market-trends">
-                {% for trend in market_intelligence.price_trends %}
-                <div class="trend-card">
-                    <h5>{{ trend.mineral }}</h5>
-                    <div class="number">${{ "{:,}".format(trend.current_price) }}</div>
-                    <div class="trend-{{ trend.trend }}">
-                        {% if trend.trend == 'up' %}
-                        ↗ +{{ trend.change_percentage }}%
-                        {% elif trend.trend == 'down' %}
-                        ↘ {{ trend.change_percentage }}%
-                        {% else %}
-                        → {{ trend.change_percentage }}%
-                        {% endif %}
-                    </div>
-                </div>
-                {% endfor %}
+                {{ fragments.price_trends }}
             </div>
 
             <h3>Latest News</h3>
-            {% for news in market_intelligence.market_news %}
-            <div class="news-item impact-{{ news.impact }}">
-                <h6>{{ news.title }}</h6>
-                <p class="mb-1">{{ news.summary }}</p>
-                <small class="text-muted">{{ news.date }} • Impact: {{ news.impact|title }}</small>
-            </div>
-            {% endfor %}
+            {{ fragments.market_news }}
         </div>
 
         <!-- Interactive Map Section -->
@@ -902,60 +889,13 @@ DASHBOARD_HTML = '''
         </div>
 
         <!-- NEW: Investment Opportunities (Visible to investors and admin) -->
-        {% if user_data.role in ['investor', 'admin'] %}
-        <div class="section">
-            <h2><span class="icon">💼</span>Investment Opportunities</h2>
-            {% for opportunity in investment_opportunities %}
-            <div class="investment-card">
-                <h4>{{ opportunity.title }}</h4>
-                <div class="row">
-                    <div class="col-md-6">
-                        <strong>Country:</strong> {{ opportunity.country }}<br>
-                        <strong>Mineral:</strong> {{ opportunity.mineral }}<br>
-                        <strong>Investment Required:</strong> {{ opportunity.investment_required }}
-                    </div>
-                    <div class="col-md-6">
-                        <strong>Estimated ROI:</strong> {{ opportunity.estimated_roi }}<br>
-                        <strong>Risk Level:</strong> <span class="risk-{{ opportunity.risk_level|lower }}">{{ opportunity.risk_level }}</span><br>
-                        <strong>Status:</strong> {{ opportunity.status }}
-                    </div>
-                </div>
-                <small class="text-muted">Timeline: {{ opportunity.timeline }}</small>
-            </div>
-            {% endfor %}
-        </div>
-        {% endif %}
+        {{ fragments.investment_opportunities }}
 
         <!-- Minerals Section -->
         <div class="section">
             <h2><span class="icon">💎</span>Critical Minerals</h2>
             <div class="row">
-                {% for mineral in minerals %}
-                <div class="col-md-6 mb-4">
-                    <div class="mineral-card" onclick="showMineralOnMap('{{ mineral.name }}')">
-                        <h4>{{ mineral.name }}</h4>
-                        <p class="text-muted">{{ mineral.description }}</p>
-                        <div class="row mt-3">
-                            <div class="col-6">
-                                <strong>Price:</strong><br>
-                                <span class="text-warning">{{ mineral.price }} {{ mineral.unit }}</span>
-                            </div>
-                            <div class="col-6">
-                                <strong>Trend:</strong><br>
-                                {% if mineral.trend == 'increasing' %}
-                                <span class="text-success">↗ Increasing</span>
-                                {% else %}
-                                <span class="text-warning">→ Stable</span>
-                                {% endif %}
-                            </div>
-                        </div>
-                        <div class="mt-2">
-                            <small><strong>Demand Growth:</strong> {{ mineral.demand_growth }}</small><br>
-                            <small><strong>Applications:</strong> {{ mineral.applications|join(', ') }}</small>
-                        </div>
-                    </div>
-                </div>
-                {% endfor %}
+                {{ fragments.minerals }}
             </div>
         </div>
 
@@ -963,29 +903,7 @@ DASHBOARD_HTML = '''
         <div class="section">
             <h2><span class="icon">🌍</span>Country Profiles</h2>
             <div class="row">
-                {% for country in countries %}
-                <div class="col-md-6 mb-4">
-                    <div class="country-card" onclick="showCountryOnMap({{ country.id }})">
-                        <h4>{{ country.name }}</h4>
-                        <p class="text-muted">Capital: {{ country.capital }}</p>
-                        <div class="row mt-3">
-                            <div class="col-6">
-                                <strong>GDP:</strong><br>
-                                <span class="text-info">{{ country.gdp }}</span>
-                            </div>
-                            <div class="col-6">
-                                <strong>Population:</strong><br>
-                                <span class="text-info">{{ country.population }}</span>
-                            </div>
-                        </div>
-                        <div class="mt-2">
-                            <small><strong>Political Stability:</strong> {{ country.political_stability }}</small><br>
-                            <small><strong>Infrastructure:</strong> {{ country.infrastructure }}</small><br>
-                            <small><strong>Key Minerals:</strong> {{ country.key_minerals|join(', ') }}</small>
-                        </div>
-                    </div>
-                </div>
-                {% endfor %}
+                {{ fragments.countries }}
             </div>
         </div>
 
@@ -993,29 +911,7 @@ DASHBOARD_HTML = '''
         <div class="section">
             <h2><span class="icon">⛏️</span>Mining Sites</h2>
             <div class="row">
-                {% for site in mining_sites %}
-                <div class="col-md-6 mb-4">
-                    <div class="site-card" onclick="showSiteOnMap({{ site.id }})">
-                        <h4>{{ site.name }}</h4>
-                        <p class="text-muted">{{ site.country }} • {{ site.mineral }}</p>
-                        <div class="row mt-3">
-                            <div class="col-6">
-                                <strong>Production:</strong><br>
-                                <span class="text-warning">{{ site.production }}</span>
-                            </div>
-                            <div class="col-6">
-                                <strong>Status:</strong><br>
-                                <span class="text-success">{{ site.status }}</span>
-                            </div>
-                        </div>
-                        <div class="mt-2">
-                            <small><strong>Employment:</strong> {{ site.employment }}</small><br>
-                            <small><strong>Established:</strong> {{ site.year_established }}</small><br>
-                            <small><strong>Environmental Rating:</strong> {{ site.environmental_rating }}</small>
-                        </div>
-                    </div>
-                </div>
-                {% endfor %}
+                {{ fragments.mining_sites }}
             </div>
         </div>
 
@@ -1129,61 +1025,53 @@ DASHBOARD_HTML = '''
                 // Remove fallback message
                 document.getElementById('mapFallback').style.display = 'none';
 
-                // Country data
-                var countries = {
-                    {% for country in countries %}
-                    {{ country.id }}: {
-                        name: "{{ country.name }}",
-                        lat: {{ country.coordinates.lat }},
-                        lng: {{ country.coordinates.lng }},
-                        capital: "{{ country.capital }}",
-                        gdp: "{{ country.gdp }}",
-                        population: "{{ country.population }}",
-                        mining_contribution: "{{ country.mining_contribution }}",
-                        key_minerals: {{ country.key_minerals | tojson }},
-                        area: "{{ country.area }}",
-                        investment_rating: "{{ country.investment_rating }}"
-                    }{% if not loop.last %},{% endif %}
-                    {% endfor %}
-                };
-
-                // Mining sites data
-                var miningSites = {
-                    {% for site in mining_sites %}
-                    {{ site.id }}: {
-                        name: "{{ site.name }}",
-                        country: "{{ site.country }}",
-                        mineral: "{{ site.mineral }}",
-                        lat: {{ site.lat }},
-                        lng: {{ site.lng }},
-                        production: "{{ site.production }}",
-                        operator: "{{ site.operator }}",
-                        reserves: "{{ site.reserves }}",
-                        status: "{{ site.status }}"
-                    }{% if not loop.last %},{% endif %}
-                    {% endfor %}
-                };
-
-                // Custom icons
-                var countryIcon = L.divIcon({
-                    className: 'custom-country-marker',
-                    html: '<div style="background-color: #22c55e; width: 12px; height: 12px; border-radius: 50%; border: 2px solid white;"></div>',
-                    iconSize: [16, 16],
-                    iconAnchor: [8, 8]
-                });
+                // Map data is fetched from the GeoJSON endpoint once the page has painted;
+                // mining sites tile by tile for the visible viewport
+                var countries = {};
+                var miningSites = {};
+                var siteLayer = L.layerGroup().addTo(map);
+                var tileGroups = {};
+
+                // Markers are drawn on one shared canvas instead of a DOM element each
+                var canvasRenderer = L.canvas({padding: 0.5});
+
+                function circle(latlng, radius, color) {
+                    return L.circleMarker(latlng, {
+                        renderer: canvasRenderer,
+                        radius: radius,
+                        color: 'white',
+                        weight: 2,
+                        fillColor: color,
+                        fillOpacity: 0.9
+                    });
+                }
 
-                var siteIcon = L.divIcon({
-                    className: 'custom-site-marker',
-                    html: '<div style="background-color: #f59e0b; width: 12px; height: 12px; border-radius: 50%; border: 2px solid white;"></div>',
-                    iconSize: [16, 16],
-                    iconAnchor: [8, 8]
-                });
+                // Build a marker's popup on its first click from the record's API endpoint
+                function lazyPopup(marker, url, render) {
+                    marker.once('click', function() {
+                        marker.bindPopup('<div style="color: #1e293b;">Loading...</div>').openPopup();
+                        fetch(url)
+                            .then(function(response) { return response.json(); })
+                            .then(function(payload) {
+                                marker.setPopupContent(payload.data ? render(payload.data) : 'Details unavailable');
+                            })
+                            .catch(function() {
+                                marker.setPopupContent('Details unavailable');
+                            });
+                    });
+                    return marker;
+                }
 
-                // Add country markers to the map
-                Object.values(countries).forEach(function(country) {
-                    var marker = L.marker([country.lat, country.lng], {icon: countryIcon})
-                        .addTo(map)
-                        .bindPopup(`
+                // Flatten a GeoJSON point feature back into a record with lat/lng
+                function featureRecord(feature) {
+                    return Object.assign({}, feature.properties, {
+                        lat: feature.geometry.coordinates[1],
+                        lng: feature.geometry.coordinates[0]
+                    });
+                }
+
+                function countryPopup(country) {
+                    return `
                             <div style="min-width: 250px; color: #1e293b;">
                                 <h4 style="color: #22c55e; margin-bottom: 10px; border-bottom: 2px solid #22c55e; padding-bottom: 5px;">${country.name}</h4>
                                 <p><strong>🏛️ Capital:</strong> ${country.capital}</p>
@@ -1194,14 +1082,85 @@ DASHBOARD_HTML = '''
                                 <p><strong>🗺️ Area:</strong> ${country.area}</p>
                                 <p><strong>💎 Key Minerals:</strong> ${country.key_minerals.join(', ')}</p>
                             </div>
-                        `);
+                        `;
+                }
+
+                function addCountryMarker(country) {
+                    lazyPopup(circle([country.lat, country.lng], 7, '#22c55e'), '/api/country/' + country.id, countryPopup)
+                        .addTo(map);
+                }
+
+                fetch('/api/map/features.geojson?layers=countries&summary=1')
+                    .then(function(response) { return response.json(); })
+                    .then(function(collection) {
+                        (collection.features || []).forEach(function(feature) {
+                            var country = featureRecord(feature);
+                            countries[country.id] = country;
+                            addCountryMarker(country);
+                        });
+                    })
+                    .catch(function(error) {
+                        console.error('Error loading countries:', error);
+                    });
+
+                // Sites come from /tiles/sites/{z}/{x}/{y}: Leaflet requests only the tiles in view,
+                // and each tile's markers are dropped again when the tile is unloaded
+                var SiteTileLayer = L.GridLayer.extend({
+                    createTile: function(coords, done) {
+                        var tile = document.createElement('div');
+                        var key = this._tileCoordsToKey(coords);
+                        tileGroups[key] = null;
+                        fetch('/tiles/sites/' + coords.z + '/' + coords.x + '/' + coords.y)
+                            .then(function(response) { return response.json(); })
+                            .then(function(collection) {
+                                if (!(key in tileGroups)) {
+                                    return done(null, tile);  // unloaded while in flight
+                                }
+                                var group = L.layerGroup();
+                                (collection.features || []).forEach(function(feature) {
+                                    if (feature.properties.kind === 'cluster') {
+                                        addClusterMarker(Object.assign({
+                                            lat: feature.geometry.coordinates[1],
+                                            lng: feature.geometry.coordinates[0]
+                                        }, feature.properties), group);
+                                    } else {
+                                        var site = featureRecord(feature);
+                                        miningSites[site.id] = site;
+                                        addSiteMarker(site, group);
+                                    }
+                                });
+                                tileGroups[key] = group.addTo(siteLayer);
+                                done(null, tile);
+                            })
+                            .catch(function(error) {
+                                console.error('Error loading mining site tile:', error);
+                                done(error, tile);
+                            });
+                        return tile;
+                    }
                 });
 
-                // Add mining site markers to the map
-                Object.values(miningSites).forEach(function(site) {
-                    var marker = L.marker([site.lat, site.lng], {icon: siteIcon})
-                        .addTo(map)
-                        .bindPopup(`
+                var siteTiles = new SiteTileLayer({tileSize: 256});
+                siteTiles.on('tileunload', function(event) {
+                    var key = siteTiles._tileCoordsToKey(event.coords);
+                    if (tileGroups[key]) {
+                        siteLayer.removeLayer(tileGroups[key]);
+                    }
+                    delete tileGroups[key];
+                });
+                siteTiles.addTo(map);
+
+                function addClusterMarker(cluster, layer) {
+                    circle([cluster.lat, cluster.lng], Math.min(24, 10 + 3 * Math.floor(Math.log10(cluster.count))), '#f59e0b')
+                        .addTo(layer)
+                        .bindTooltip(cluster.count + ' sites • mostly ' + cluster.dominant_mineral)
+                        .on('click', function() {
+                            map.setView([cluster.lat, cluster.lng], map.getZoom() + 2);
+                        });
+                }
+
+                function sitePopup(site) {
+                    return `
                             <div style="min-width: 250px; color: #1e293b;">
                                 <h4 style="color: #f59e0b; margin-bottom: 10px; border-bottom: 2px solid #f59e0b; padding-bottom: 5px;">${site.name}</h4>
                                 <p><strong>🌍 Country:</strong> ${site.country}</p>
@@ -1212,8 +1171,13 @@ DASHBOARD_HTML = '''
                                 <p><strong>🟢 Status:</strong> ${site.status}</p>
                                 <p><strong>📍 Coordinates:</strong> ${site.lat}, ${site.lng}</p>
                             </div>
-                        `);
-                });
+                        `;
+                }
+
+                function addSiteMarker(site, layer) {
+                    lazyPopup(circle([site.lat, site.lng], 6, '#f59e0b'), '/api/mining-site/' + site.id, sitePopup)
+                        .addTo(layer);
+                }
 
                 // Store map and data globally for other functions
                 window.mineralsMap = map;
@@ -1287,7 +1251,16 @@ DASHBOARD_HTML = '''
             var site = window.mapMiningSites[siteId];
             if (site) {
                 window.mineralsMap.setView([site.lat, site.lng], 8);
+                return;
             }
+            // Sites outside the viewport have not been fetched yet
+            fetch('/api/mining-site/' + siteId)
+                .then(function(response) { return response.json(); })
+                .then(function(payload) {
+                    if (payload.data) {
+                        window.mineralsMap.setView([payload.data.lat, payload.data.lng], 8);
+                    }
+                });
         }
 
         window.showMineralOnMap = function(mineralName) {
@@ -1296,17 +1269,16 @@ DASHBOARD_HTML = '''
                 return;
             }
             
-            var sitesForMineral = Object.values(window.mapMiningSites).filter(site => 
-                site.mineral.toLowerCase() === mineralName.toLowerCase()
-            );
-            
-            if (sitesForMineral.length > 0) {
-                var group = new L.featureGroup();
-                sitesForMineral.forEach(site => {
-                    group.addLayer(L.marker([site.lat, site.lng]));
+            fetch('/api/mining-sites?mineral=' + encodeURIComponent(mineralName) + '&fields=lat,lng')
+                .then(function(response) { return response.json(); })
+                .then(function(payload) {
+                    var sitesForMineral = payload.data || [];
+                    
+                    if (sitesForMineral.length > 0) {
+                        var bounds = L.latLngBounds(sitesForMineral.map(site => [site.lat, site.lng]));
+                        window.mineralsMap.fitBounds(bounds.pad(0.1));
+                    }
                 });
-                window.mineralsMap.fitBounds(group.getBounds().pad(0.1));
-            }
         }
 
         // NEW: Session timer
@@ -1338,6 +1310,138 @@ DASHBOARD_HTML = '''
 </html>
 '''
 
+# Dashboard sections rendered on their own and cached per data version and role,
+# so a page view mostly joins pre-rendered HTML around the per-user parts
+DASHBOARD_FRAGMENTS = {
+    'price_trends': '''{% for trend in market_intelligence.price_trends %}
+                <div class="trend-card">
+                    <h5>{{ trend.mineral }}</h5>
+                    <div class="number">${{ "{:,}".format(trend.current_price) }}</div>
+                    <div class="trend-{{ trend.trend }}">
+                        {% if trend.trend == 'up' %}
+                        ↗ +{{ trend.change_percentage }}%
+                        {% elif trend.trend == 'down' %}
+                        ↘ {{ trend.change_percentage }}%
+                        {% else %}
+                        → {{ trend.change_percentage }}%
+                        {% endif %}
+                    </div>
+                </div>
+                {% endfor %}''',
+    'market_news': '''{% for news in market_intelligence.market_news %}
+            <div class="news-item impact-{{ news.impact }}">
+                <h6>{{ news.title }}</h6>
+                <p class="mb-1">{{ news.summary }}</p>
+                <small class="text-muted">{{ news.date }} • Impact: {{ news.impact|title }}</small>
+            </div>
+            {% endfor %}''',
+    'investment_opportunities': '''{% if role in ['investor', 'admin'] %}
+        <div class="section">
+            <h2><span class="icon">💼</span>Investment Opportunities</h2>
+            {% for opportunity in investment_opportunities %}
+            <div class="investment-card">
+                <h4>{{ opportunity.title }}</h4>
+                <div class="row">
+                    <div class="col-md-6">
+                        <strong>Country:</strong> {{ opportunity.country }}<br>
+                        <strong>Mineral:</strong> {{ opportunity.mineral }}<br>
+                        <strong>Investment Required:</strong> {{ opportunity.investment_required }}
+                    </div>
+                    <div class="col-md-6">
+                        <strong>Estimated ROI:</strong> {{ opportunity.estimated_roi }}<br>
+                        <strong>Risk Level:</strong> <span class="risk-{{ opportunity.risk_level|lower }}">{{ opportunity.risk_level }}</span><br>
+                        <strong>Status:</strong> {{ opportunity.status }}
+                    </div>
+                </div>
+                <small class="text-muted">Timeline: {{ opportunity.timeline }}</small>
+            </div>
+            {% endfor %}
+        </div>
+        {% endif %}''',
+    'minerals': '''{% for mineral in minerals %}
+                <div class="col-md-6 mb-4">
+                    <div class="mineral-card" onclick="showMineralOnMap('{{ mineral.name }}')">
+                        <h4>{{ mineral.name }}</h4>
+                        <p class="text-muted">{{ mineral.description }}</p>
+                        <div class="row mt-3">
+                            <div class="col-6">
+                                <strong>Price:</strong><br>
+                                <span class="text-warning">{{ mineral.price }} {{ mineral.unit }}</span>
+                            </div>
+                            <div class="col-6">
+                                <strong>Trend:</strong><br>
+                                {% if mineral.trend == 'increasing' %}
+                                <span class="text-success">↗ Increasing</span>
+                                {% else %}
+                                <span class="text-warning">→ Stable</span>
+                                {% endif %}
+                            </div>
+                        </div>
+                        <div class="mt-2">
+                            <small><strong>Demand Growth:</strong> {{ mineral.demand_growth }}</small><br>
+                            <small><strong>Applications:</strong> {{ mineral.applications|join(', ') }}</small>
+                        </div>
+                    </div>
+                </div>
+                {% endfor %}''',
+    'countries': '''{% for country in countries %}
+                <div class="col-md-6 mb-4">
+                    <div class="country-card" onclick="showCountryOnMap({{ country.id }})">
+                        <h4>{{ country.name }}</h4>
+                        <p class="text-muted">Capital: {{ country.capital }}</p>
+                        <div class="row mt-3">
+                            <div class="col-6">
+                                <strong>GDP:</strong><br>
+                                <span class="text-info">{{ country.gdp }}</span>
+                            </div>
+                            <div class="col-6">
+                                <strong>Population:</strong><br>
+                                <span class="text-info">{{ country.population }}</span>
+                            </div>
+                        </div>
+                        <div class="mt-2">
+                            <small><strong>Political Stability:</strong> {{ country.political_stability }}</small><br>
+                            <small><strong>Infrastructure:</strong> {{ country.infrastructure }}</small><br>
+                            <small><strong>Key Minerals:</strong> {{ country.key_minerals|join(', ') }}</small>
+                        </div>
+                    </div>
+                </div>
+                {% endfor %}''',
+    'mining_sites': '''{% for site in mining_sites %}
+                <div class="col-md-6 mb-4">
+                    <div class="site-card" onclick="showSiteOnMap({{ site.id }})">
+                        <h4>{{ site.name }}</h4>
+                        <p class="text-muted">{{ site.country }} • {{ site.mineral }}</p>
+                        <div class="row mt-3">
+                            <div class="col-6">
+                                <strong>Production:</strong><br>
+                                <span class="text-warning">{{ site.production }}</span>
+                            </div>
+                            <div class="col-6">
+                                <strong>Status:</strong><br>
+                                <span class="text-success">{{ site.status }}</span>
+                            </div>
+                        </div>
+                        <div class="mt-2">
+                            <small><strong>Employment:</strong> {{ site.employment }}</small><br>
+                            <small><strong>Established:</strong> {{ site.year_established }}</small><br>
+                            <small><strong>Environmental Rating:</strong> {{ site.environmental_rating }}</small>
+                        </div>
+                    </div>
+                </div>
+                {% endfor %}'''
+}
+
+# Collections each dashboard section is rendered from
+DASHBOARD_FRAGMENT_DATA = {
+    'price_trends': ('market_intelligence',),
+    'market_news': ('market_intelligence',),
+    'investment_opportunities': ('investment_opportunities',),
+    'minerals': ('minerals',),
+    'countries': ('countries',),
+    'mining_sites': ('mining_sites',)
+}
+
 ADMIN_HTML = '''
 <!DOCTYPE html>
 <html lang="en">
@@ -1551,6 +1655,17 @@ ADMIN_HTML = '''
             color: #94a3b8;
         }
 
+        .activity-filters {
+            display: flex;
+            flex-wrap: wrap;
+            gap: 8px;
+        }
+
+        .activity-filters .form-control {
+            flex: 1 1 140px;
+            width: auto;
+        }
+
         @media (max-width: 768px) {
             .container {
                 padding: 20px;
@@ -1597,7 +1712,7 @@ ADMIN_HTML = '''
                             </span>
                         </td>
                         <td>{{ user.name }}</td>
-                        <td>{{ user.last_login or 'Never' }}</td>
+                        <td>{{ user.last_login|epoch if user.last_login else 'Never' }}</td>
                         <td>
                             <button class="btn btn-sm btn-outline-warning">Edit</button>
                             <button class="btn btn-sm btn-outline-danger">Reset Password</button>
@@ -1611,12 +1726,20 @@ ADMIN_HTML = '''
         <!-- NEW: Activity Log Section -->
         <div class="section">
             <h2><span class="icon">📋</span>Activity Log</h2>
+            <form method="GET" action="/admin" class="activity-filters">
+                <input type="text" class="form-control" name="user" placeholder="User" value="{{ activity_filters.get('user', '') }}">
+                <input type="text" class="form-control" name="role" placeholder="Role" value="{{ activity_filters.get('role', '') }}">
+                <input type="text" class="form-control" name="endpoint" placeholder="Endpoint" value="{{ activity_filters.get('endpoint', '') }}">
+                <input type="text" class="form-control" name="since" placeholder="Since (YYYY-MM-DD)" value="{{ activity_filters.get('since', '') }}">
+                <input type="text" class="form-control" name="until" placeholder="Until (YYYY-MM-DD)" value="{{ activity_filters.get('until', '') }}">
+                <button type="submit" class="btn btn-sm btn-outline-primary">Filter</button>
+            </form>
             <div class="activity-log">
-                {% if session.get('user_activity') %}
-                    {% for activity in session.user_activity %}
+                {% if activities %}
+                    {% for activity in activities %}
                     <div class="activity-item">
                         <div>{{ activity.activity }}</div>
-                        <div class="activity-time">{{ activity.timestamp }}</div>
+                        <div class="activity-time">{{ activity.timestamp }} · {{ activity.username }} ({{ activity.role }}) · {{ activity.endpoint }}</div>
                     </div>
                     {% endfor %}
                 {% else %}
@@ -1683,6 +1806,10 @@ ADMIN_HTML = '''
 </html>
 '''
 
+def format_epoch(value, fmt='%Y-%m-%d %H:%M:%S'):
+    """Jinja filter: format epoch seconds as local time"""
+    return datetime.fromtimestamp(value).strftime(fmt)
+
 class TemplateManager:
     """Manager for all HTML templates in the application"""
     
@@ -1690,21 +1817,59 @@ class TemplateManager:
         self.templates = {
             'index': INDEX_HTML,
             'dashboard': DASHBOARD_HTML,
-            'admin': ADMIN_HTML
-        }
+            'admin': ADMIN_HTML,
+            'login': LOGIN_HTML
+        }
+        self.fragments = DASHBOARD_FRAGMENTS
+        # Parsed and compiled Jinja templates, built once per environment
+        self.environment = None
+        self.compiled = {}
+        self.compiled_fragments = {}
+        # (section, role) -> (data version, rendered HTML); older versions are simply replaced
+        self.fragment_cache = {}
     
     def get_template(self, template_name):
         """Get template by name"""
         return self.templates.get(template_name)
     
+    def compile_all(self, environment):
+        """Compile every template once for a Jinja environment (e.g. app.jinja_env)"""
+        environment.filters['epoch'] = format_epoch
+        self.compiled = {
+            name: environment.from_string(source) for name, source in self.templates.items()
+        }
+        self.compiled_fragments = {
+            name: environment.from_string(source) for name, source in self.fragments.items()
+        }
+        self.fragment_cache = {}
+        self.environment = environment
+        return self.compiled
+    
+    def get_compiled(self, template_name):
+        """Get the compiled template for the current Flask app"""
+        environment = current_app.jinja_env
+        if environment is not self.environment:
+            self.compile_all(environment)
+        return self.compiled.get(template_name)
+    
     def render_template(self, template_name, **context):
-        """Render template with context (simplified for Flask)"""
-        template = self.get_template(template_name)
-        if template:
-            # In a real Flask app, this would use Flask's render_template
-            # For this structure, we return the template and context
-            return template, context
-        return None, context
+        """Render a compiled template with the same context Flask's render_template provides"""
+        template = self.get_compiled(template_name)
+        if template is None:
+            raise KeyError(f"Unknown template: {template_name}")
+        current_app.update_template_context(context)
+        return template.render(context)
+    
+    def render_fragment(self, section, version, role, **context):
+        """Render a page section, reusing the cached HTML while its data version and the role are unchanged"""
+        if current_app.jinja_env is not self.environment:
+            self.compile_all(current_app.jinja_env)
+        cached = self.fragment_cache.get((section, role))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        html = Markup(self.compiled_fragments[section].render(context, role=role))
+        self.fragment_cache[(section, role)] = (version, html)
+        return html
 
 # Global template manager instance
 template_manager = TemplateManager()
@@ -1721,5 +1886,17 @@ def get_admin_template():
 
 def get_login_template():
     """Login template is managed by auth_manager"""
-    from auth_manager import LOGIN_HTML
-    return LOGIN_HTML
+    return template_manager.get_template('login')
+
+def render_dashboard_fragments(role, version_of, **context):
+    """Render (or reuse) every dashboard section; version_of maps a collection name to its data version"""
+    return {
+        section: template_manager.render_fragment(
+            section, tuple(version_of(name) for name in collections), role, **context
+        )
+        for section, collections in DASHBOARD_FRAGMENT_DATA.items()
+    }
+
+def render_page(template_name, **context):
+    """Render a page from the compiled template cache"""
+    return template_manager.render_template(template_name, **context)